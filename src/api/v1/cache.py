@@ -0,0 +1,44 @@
+from http import HTTPStatus
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from cache.cache import get_cache
+from core.config import settings
+from models.models import CacheCleanup, CacheInvalidation, User
+from services.users import get_current_user
+
+router = APIRouter()
+
+
+async def get_admin_user(user: User = Depends(get_current_user)) -> User:
+    if settings.admin_right not in (user.access_rights or []):
+        raise HTTPException(status_code=HTTPStatus.FORBIDDEN, detail="forbidden")
+    return user
+
+
+@router.post(
+    "/invalidate",
+    response_model=CacheInvalidation,
+    summary="Сбросить кэш по тегам",
+    description="Удалить все записи кэша, помеченные любым из тегов, например film:<uuid>, genre:<uuid>, person:<uuid>",
+    response_description="Теги и количество удалённых записей",
+    tags=['Кэш'],
+)
+async def invalidate(
+    tag: list[str] = Query(..., description="Тег записей кэша"),
+    user: User = Depends(get_admin_user),
+) -> CacheInvalidation:
+    removed = await get_cache().invalidate_tags(tag)
+    return CacheInvalidation(tags=tag, removed=removed)
+
+
+@router.post(
+    "/cleanup",
+    response_model=CacheCleanup,
+    summary="Очистить теги кэша",
+    description="Убрать из тегов ключи уже истёкших записей кэша",
+    response_description="Количество убранных ключей",
+    tags=['Кэш'],
+)
+async def cleanup(user: User = Depends(get_admin_user)) -> CacheCleanup:
+    return CacheCleanup(removed=await get_cache().cleanup_tags())
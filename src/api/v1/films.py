@@ -1,9 +1,9 @@
 from http import HTTPStatus
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 
-from core.pagination import PaginateQueryParams
+from core.pagination import NEXT_CURSOR_HEADER, PaginateQueryParams, next_cursor
 from models.models import Film, FilmShort
 from services.abc import FilmServiceABC
 from services.films import get_film_service
@@ -46,16 +46,21 @@ async def film_details(
     tags=['Списки'],
 )
 async def film_list(
+    response: Response,
     sort: str | None = None,
     genre_id: str | None = None,
     similar_to: str | None = None,
     pagination: PaginateQueryParams = Depends(PaginateQueryParams),
     film_service: FilmServiceABC = Depends(get_film_service),
 ) -> list[Film]:
+    pagination.check_cursor(sort, Film)
     films = await film_service.get_films(sort, pagination, genre_id, similar_to)
     if not films:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="films not found")
 
+    if cursor := next_cursor(films, sort, pagination):
+        response.headers[NEXT_CURSOR_HEADER] = cursor
+
     return films
 
 
@@ -68,12 +73,17 @@ async def film_list(
     tags=['Полнотекстовый поиск'],
 )
 async def film_list_query(
+    response: Response,
     query: str = "",
     pagination: PaginateQueryParams = Depends(PaginateQueryParams),
     film_service: FilmServiceABC = Depends(get_film_service),
 ) -> list[Film]:
+    pagination.check_cursor(None, Film)
     films = await film_service.get_by_query(query, pagination)
     if not films:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="film not found")
 
+    if cursor := next_cursor(films, None, pagination):
+        response.headers[NEXT_CURSOR_HEADER] = cursor
+
     return films
@@ -1,11 +1,12 @@
 from http import HTTPStatus
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 
-from core.pagination import PaginateQueryParams
-from models.models import FilmShort, Person
+from core.pagination import NEXT_CURSOR_HEADER, PaginateQueryParams, next_cursor
+from models.models import FilmRoles, FilmShort, Person, PersonShort
 from services.abc import FilmServiceABC, PersonServiceABC
+from services.concurrency import gather
 from services.films import get_film_service
 from services.persons import get_persons_service
 
@@ -21,11 +22,13 @@ router = APIRouter()
     tags=['Полнотекстовый поиск'],
 )
 async def person_list(
+    response: Response,
     query: str,
     pagination_params: PaginateQueryParams = Depends(PaginateQueryParams),
     persons_service: PersonServiceABC = Depends(get_persons_service),
     film_service: FilmServiceABC = Depends(get_film_service),
 ) -> list[Person]:
+    pagination_params.check_cursor(None, PersonShort)
     persons = await persons_service.get_by_query(query, pagination_params)
 
     if not persons:
@@ -33,14 +36,17 @@ async def person_list(
             status_code=HTTPStatus.NOT_FOUND, detail="persons not found"
         )
 
+    films = await film_service.get_films_with_roles_by_persons(
+        [person.id for person in persons], pagination_params.without_cursor()
+    )
+
+    if cursor := next_cursor(persons, None, pagination_params):
+        response.headers[NEXT_CURSOR_HEADER] = cursor
+
     return [
-        Person(
-            **dict(person),
-            films=await film_service.get_films_with_roles_by_person(
-                person.id, pagination_params
-            ),
-        )
-        for person in persons
+        # None - поиск фильмов персоны не удался, страница остальных не страдает
+        Person(**dict(person), films=person_films or [])
+        for person, person_films in zip(persons, films)
     ]
 
 
@@ -58,15 +64,15 @@ async def person_details(
     persons_service: PersonServiceABC = Depends(get_persons_service),
     film_service: FilmServiceABC = Depends(get_film_service),
 ) -> Person:
-    person = await persons_service.get_by_id(person_id)
+    pagination_params.check_cursor(None, FilmRoles)
+    person, films = await gather(
+        persons_service.get_by_id(person_id),
+        film_service.get_films_with_roles_by_person(person_id, pagination_params),
+    )
 
     if not person:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="person not found")
 
-    films = await film_service.get_films_with_roles_by_person(
-        person_id, pagination_params
-    )
-
     if films is None:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="films not found")
 
@@ -87,13 +93,15 @@ async def person_films(
     persons_service: PersonServiceABC = Depends(get_persons_service),
     film_service: FilmServiceABC = Depends(get_film_service),
 ) -> list[FilmShort]:
-    person = await persons_service.get_by_id(person_id)
+    pagination_params.check_cursor(None, FilmShort)
+    person, films = await gather(
+        persons_service.get_by_id(person_id),
+        film_service.get_films_by_person(person_id, pagination_params),
+    )
 
     if not person:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="person not found")
 
-    films = await film_service.get_films_by_person(person_id, pagination_params)
-
     if films is None:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="films not found")
 
@@ -0,0 +1,116 @@
+"""
+Доля попаданий и память кэша с фиксированным и адаптивным временем жизни.
+
+Воспроизводит поток обращений к ключам с постоянной частотой --rps и
+моделирует кэш: запись живёт ttl секунд, при промахе кладётся заново.
+Память оценивается средним и максимальным числом живых записей.
+Поток берётся из access log (ключ - путь запроса) или генерируется по
+закону Ципфа.
+
+Запуск из src:
+    python -m benchmarks.adaptive_ttl [--requests 200000] [--keys 50000] [--ttl 60]
+    python -m benchmarks.adaptive_ttl --access-log access.log
+"""
+import argparse
+import random
+import re
+from itertools import accumulate
+from typing import Iterable
+
+from cache.adaptive import AdaptiveTTL, CountMinSketch, FixedTTL
+from core.config import settings
+
+ACCESS_LOG_REQUEST = re.compile(r'"GET (?P<path>\S+) HTTP/[\d.]+"')
+
+
+def zipf_trace(requests: int, keys: int, exponent: float, seed: int) -> list[str]:
+    weights = list(accumulate(1 / rank**exponent for rank in range(1, keys + 1)))
+    rng = random.Random(seed)
+    ranks = rng.choices(range(keys), cum_weights=weights, k=requests)
+    return [f'key:{rank}' for rank in ranks]
+
+
+def access_log_trace(lines: Iterable[str]) -> list[str]:
+    return [match['path'] for match in map(ACCESS_LOG_REQUEST.search, lines) if match]
+
+
+def replay(trace: list[str], ttl: float, rps: float, policy: FixedTTL) -> dict:
+    expires: dict[str, float] = {}
+    hits = 0
+    live_total = live_max = 0
+    for step, key in enumerate(trace):
+        now = step / rps
+        policy.touch(key)
+        if expires.get(key, 0) > now:
+            hits += 1
+        else:
+            scaled = policy.scale(key, ttl)
+            if scaled:
+                expires[key] = now + scaled
+            else:
+                expires.pop(key, None)
+
+        # Истёкшие записи вычищаем периодически, как это делал бы Redis
+        if step % 1000 == 0:
+            expires = {k: at for k, at in expires.items() if at > now}
+        live_total += len(expires)
+        live_max = max(live_max, len(expires))
+
+    return {
+        'hit rate': hits / len(trace),
+        'avg entries': live_total / len(trace),
+        'max entries': live_max,
+    }
+
+
+def adaptive_policy(admission_threshold: int) -> AdaptiveTTL:
+    width = settings.cache_adaptive_sketch_width
+    return AdaptiveTTL(
+        CountMinSketch(
+            width,
+            settings.cache_adaptive_sketch_depth,
+            width * settings.cache_adaptive_sample_factor,
+        ),
+        hot_threshold=settings.cache_adaptive_hot_threshold,
+        hot_factor=settings.cache_adaptive_hot_factor,
+        cold_factor=settings.cache_adaptive_cold_factor,
+        admission_threshold=admission_threshold,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--access-log', type=argparse.FileType('r'))
+    parser.add_argument('--requests', type=int, default=200_000)
+    parser.add_argument('--keys', type=int, default=50_000)
+    parser.add_argument('--exponent', type=float, default=1.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--rps', type=float, default=200)
+    parser.add_argument(
+        '--ttl', type=float, default=settings.cache_expiration_in_seconds
+    )
+    args = parser.parse_args()
+
+    if args.access_log:
+        with args.access_log:
+            trace = access_log_trace(args.access_log)
+    else:
+        trace = zipf_trace(args.requests, args.keys, args.exponent, args.seed)
+
+    policies = {
+        'fixed': FixedTTL(),
+        'adaptive': adaptive_policy(settings.cache_adaptive_admission_threshold),
+        'adaptive, admit 2+': adaptive_policy(2),
+    }
+    print(f"{len(trace)} requests, {len(set(trace))} keys, ttl {args.ttl:g} s")
+    print(f"{'policy':<20}{'hit rate':>10}{'avg entries':>14}{'max entries':>14}")
+    for name, policy in policies.items():
+        result = replay(trace, args.ttl, args.rps, policy)
+        print(
+            f"{name:<20}{result['hit rate']:>10.1%}"
+            f"{result['avg entries']:>14.0f}{result['max entries']:>14}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Сравнение кодеков кэша на типичной странице фильмов.
+
+Запуск из src: python -m benchmarks.cache_codecs [--page-size 50] [--number 1000]
+    [--repeat 20]
+"""
+import argparse
+import timeit
+from uuid import uuid4
+
+import models.models as models
+from cache.cache import CODECS
+
+
+def film_page(page_size: int) -> list[models.FilmShort]:
+    return [
+        models.FilmShort(uuid=uuid4(), title=f'Film number {i}', imdb_rating=7.5)
+        for i in range(page_size)
+    ]
+
+
+def film_details() -> models.Film:
+    def persons(count: int) -> list[models.PersonShort]:
+        return [
+            models.PersonShort(uuid=uuid4(), full_name=f'Person {i}')
+            for i in range(count)
+        ]
+
+    return models.Film(
+        uuid=uuid4(),
+        title='Star Wars: Episode V - The Empire Strikes Back',
+        imdb_rating=8.7,
+        description='Luke Skywalker, Han Solo, Princess Leia and Chewbacca ' * 5,
+        genres=[models.GenreShort(uuid=uuid4(), name='Action')] * 4,
+        actors=persons(20),
+        writers=persons(5),
+        directors=persons(2),
+    )
+
+
+def best_time(func, number: int, repeat: int) -> float:
+    """
+    Лучшее из repeat измерений по number вызовов, мкс на вызов: меньше
+    всего зависит от фоновой нагрузки машины
+    """
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1e6
+
+
+def measure(value, number: int, repeat: int) -> None:
+    print(f"{'codec':<10}{'size, B':>10}{'dumps, us':>12}{'loads, us':>12}")
+    for name, codec in CODECS.items():
+        data = codec.dumps(value)
+        dumps = best_time(lambda: codec.dumps(value), number, repeat)
+        loads = best_time(lambda: codec.loads(data), number, repeat)
+        print(f"{name:<10}{len(data):>10}{dumps:>12.1f}{loads:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--number', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"Page of {args.page_size} FilmShort")
+    measure(film_page(args.page_size), args.number, args.repeat)
+    print("\nFilm details")
+    measure(film_details(), args.number, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+"""
+Размер ответа Elasticsearch и время его разбора с обрезкой ответа и без неё.
+
+Для запросов, которые делают ручки API, отправляет в Elasticsearch полный
+запрос (как до обрезки) и обрезанный: с filter_path, узким _source и
+track_total_hits: false. Для каждого считает байты ответа и время orjson.loads
+(медиана по --repeat разборам).
+
+Запуск из src (нужен запущенный Elasticsearch с данными):
+    python -m benchmarks.elastic_trimming [--elastic http://localhost:9200]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Any, NamedTuple
+
+import httpx
+import orjson
+
+from core.config import settings
+from db.elastic import MGET_FILTER_PATH
+from models.models import Film
+from storages.storages import HITS_FILTER_PATH, ROLES_FILTER_PATH
+
+FILM_SHORT_SOURCE = ["id", "imdb_rating", "title"]
+TRIMMED_HITS = {"filter_path": ",".join(HITS_FILTER_PATH), "track_total_hits": "false"}
+
+
+class Request(NamedTuple):
+    method: str
+    path: str
+    params: dict[str, str]
+    body: dict[str, Any] | None
+
+
+class Endpoint(NamedTuple):
+    name: str
+    full: Request
+    trimmed: Request
+
+
+def roles_query(person_id: str) -> dict[str, Any]:
+    return {
+        "bool": {
+            "should": [
+                {
+                    "nested": {
+                        "path": path,
+                        "query": {"match": {f"{path}.id": person_id}},
+                        "inner_hits": {"name": f"{path}_inner_hits", "size": 0},
+                    }
+                }
+                for path in ("actors", "writers", "directors")
+            ]
+        }
+    }
+
+
+def build_endpoints(film_id: str, person_id: str, query: str) -> list[Endpoint]:
+    films = {"size": 50, "sort": ["id"], "_source": FILM_SHORT_SOURCE}
+    search = {**films, "query": {"match": {"title": query}}}
+    roles = {**films, "query": roles_query(person_id)}
+    popularity = {
+        "query": {"exists": {"field": "imdb_rating"}},
+        "aggs": {"avg_imdb_rating": {"avg": {"field": "imdb_rating"}}},
+    }
+    persons = {
+        "size": 50,
+        "sort": ["id"],
+        "_source": ["id", "full_name"],
+        "query": {"match": {"full_name": query}},
+    }
+    return [
+        Endpoint(
+            "GET /films/",
+            Request("POST", "/movies/_search", {}, films),
+            Request("POST", "/movies/_search", TRIMMED_HITS, films),
+        ),
+        Endpoint(
+            "GET /films/search/",
+            Request("POST", "/movies/_search", {}, search),
+            Request("POST", "/movies/_search", TRIMMED_HITS, search),
+        ),
+        Endpoint(
+            "GET /films/{id}",
+            Request("GET", f"/movies/_doc/{film_id}", {}, None),
+            Request(
+                "POST",
+                "/movies/_mget",
+                {"filter_path": MGET_FILTER_PATH, "_source": ",".join(Film.__fields__)},
+                {"ids": [film_id]},
+            ),
+        ),
+        Endpoint(
+            "GET /genres/{id}",
+            Request("POST", "/movies/_search", {}, popularity),
+            Request(
+                "POST",
+                "/movies/_search",
+                {"filter_path": "aggregations", "track_total_hits": "false"},
+                {**popularity, "size": 0},
+            ),
+        ),
+        Endpoint(
+            "GET /persons/{id}",
+            Request("POST", "/movies/_search", {}, roles),
+            Request(
+                "POST",
+                "/movies/_search",
+                {**TRIMMED_HITS, "filter_path": ",".join(ROLES_FILTER_PATH)},
+                roles,
+            ),
+        ),
+        Endpoint(
+            "GET /persons/search",
+            Request("POST", "/persons/_search", {}, persons),
+            Request("POST", "/persons/_search", TRIMMED_HITS, persons),
+        ),
+    ]
+
+
+async def fetch(client: httpx.AsyncClient, request: Request) -> bytes:
+    response = await client.request(
+        request.method, request.path, params=request.params, json=request.body
+    )
+    response.raise_for_status()
+    return response.content
+
+
+def parse_time(content: bytes, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        orjson.loads(content)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+async def sample_ids(client: httpx.AsyncClient) -> tuple[str, str]:
+    """
+    id первого фильма и его первого актёра для запросов по id
+    """
+    content = await fetch(
+        client,
+        Request(
+            "POST",
+            "/movies/_search",
+            {"filter_path": "hits.hits._source"},
+            {"size": 1, "query": {"exists": {"field": "actors"}}},
+        ),
+    )
+    film = orjson.loads(content)["hits"]["hits"][0]["_source"]
+    return film["id"], film["actors"][0]["id"]
+
+
+async def run(elastic: str, query: str, repeat: int):
+    async with httpx.AsyncClient(base_url=elastic) as client:
+        film_id, person_id = await sample_ids(client)
+        print(
+            f"{'endpoint':<20}{'full, B':>10}{'trimmed, B':>12}{'saved':>8}"
+            f"{'full, us':>10}{'trimmed, us':>13}"
+        )
+        for endpoint in build_endpoints(film_id, person_id, query):
+            full = await fetch(client, endpoint.full)
+            trimmed = await fetch(client, endpoint.trimmed)
+            print(
+                f"{endpoint.name:<20}{len(full):>10}{len(trimmed):>12}"
+                f"{1 - len(trimmed) / len(full):>8.0%}"
+                f"{parse_time(full, repeat) * 1e6:>10.1f}"
+                f"{parse_time(trimmed, repeat) * 1e6:>13.1f}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--elastic', default=settings.elastic_endpoint)
+    parser.add_argument('--query', default='star')
+    parser.add_argument('--repeat', type=int, default=1000)
+    args = parser.parse_args()
+
+    asyncio.run(run(args.elastic, args.query, args.repeat))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Доля попаданий в кэш поиска с нормализацией запросов и без неё.
+
+Читает журнал запросов: по запросу в строке или access log, из которого
+берутся параметры query ручек поиска. Кэш моделируется как LRU на
+--cache-size записей, страница пагинации входит в ключ.
+
+Запуск из src: python -m benchmarks.query_hit_rate queries.log [--cache-size 10000]
+"""
+import argparse
+import re
+import sys
+from collections import OrderedDict
+from typing import Callable, Iterable, TextIO
+from urllib.parse import parse_qs, urlsplit
+
+from core.search import normalize_query
+
+# Запрос в access log: "GET /api/v1/films/search/?query=star+wars HTTP/1.1"
+ACCESS_LOG_REQUEST = re.compile(r'"GET (?P<path>\S+) HTTP/[\d.]+"')
+
+
+def read_queries(lines: Iterable[str]) -> Iterable[tuple[str, str]]:
+    """
+    Пары (запрос, остальные параметры) из журнала
+    """
+    for line in lines:
+        match = ACCESS_LOG_REQUEST.search(line)
+        if match is None:
+            query = line.rstrip('\n')
+            if query:
+                yield query, ''
+            continue
+
+        url = urlsplit(match['path'])
+        params = parse_qs(url.query, keep_blank_values=True)
+        for query in params.pop('query', []):
+            rest = '&'.join(f'{k}={v}' for k, v in sorted(params.items()))
+            yield query, f'{url.path}?{rest}'
+
+
+def hit_rate(
+    requests: Iterable[tuple[str, str]],
+    cache_size: int,
+    normalize: Callable[[str], str] = lambda query: query,
+) -> tuple[int, int]:
+    """
+    Число попаданий и запросов для LRU-кэша на cache_size ключей
+    """
+    cache: OrderedDict[tuple[str, str], None] = OrderedDict()
+    hits = total = 0
+    for query, rest in requests:
+        total += 1
+        key = (normalize(query), rest)
+        if key in cache:
+            hits += 1
+            cache.move_to_end(key)
+            continue
+        cache[key] = None
+        if len(cache) > cache_size:
+            cache.popitem(last=False)
+    return hits, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('log', type=argparse.FileType('r'), nargs='?', default='-')
+    parser.add_argument('--cache-size', type=int, default=10000)
+    args = parser.parse_args()
+
+    log: TextIO = args.log
+    with log:
+        requests = list(read_queries(log))
+    if not requests:
+        sys.exit("No search queries found")
+
+    print(f"{'keys':<12}{'hits':>10}{'requests':>10}{'hit rate':>10}{'unique':>10}")
+    for name, normalize in (
+        ('raw', lambda query: query),
+        ('normalized', normalize_query),
+    ):
+        hits, total = hit_rate(requests, args.cache_size, normalize)
+        unique = len({(normalize(query), rest) for query, rest in requests})
+        print(f"{name:<12}{hits:>10}{total:>10}{hits / total:>10.1%}{unique:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,3 @@
-from .cache import cache_decorator
+from .cache import FAILED, cache_decorator, cache_many_decorator
 
-__all__ = ['cache_decorator']
+__all__ = ['FAILED', 'cache_decorator', 'cache_many_decorator']
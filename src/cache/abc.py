@@ -1,4 +1,10 @@
+from __future__ import annotations
+
 from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Any, Iterable, Mapping, Sequence
+
+if TYPE_CHECKING:
+    from .lock import Fence
 
 
 class CacheStorageABC(ABC):
@@ -7,5 +13,85 @@ class CacheStorageABC(ABC):
         ...
 
     @abstractmethod
-    async def set(self, key: str, value: bytes | bytearray | memoryview | None):
+    async def get_with_ttl(
+        self, key: str
+    ) -> tuple[bytes | bytearray | memoryview | None, float | None]:
+        """
+        Значение и оставшееся время жизни в секундах (None, если не ограничено)
+        """
+        ...
+
+    @abstractmethod
+    async def set(
+        self,
+        key: str,
+        value: bytes | bytearray | memoryview | None,
+        expire: float | None = None,
+        tags: Iterable[str] = (),
+        fence: Fence | None = None,
+    ):
+        """
+        Если задан fence, запись делается, только пока блокировка fence
+        принадлежит вызывающему, иначе LockLostError
+        """
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str):
+        ...
+
+    @abstractmethod
+    async def get_many(
+        self, keys: Sequence[str]
+    ) -> list[bytes | bytearray | memoryview | None]:
+        """
+        Значения по ключам в том же порядке, None для отсутствующих
+        """
+        ...
+
+    @abstractmethod
+    async def set_many(
+        self,
+        items: Mapping[str, bytes | bytearray | memoryview],
+        expire: float | None = None,
+        tags: Mapping[str, Iterable[str]] | None = None,
+    ):
+        """
+        Положить несколько значений с общим временем жизни, tags - теги по ключам
+        """
+        ...
+
+    @abstractmethod
+    async def delete_many(self, keys: Iterable[str]):
+        ...
+
+    @abstractmethod
+    async def invalidate_tags(self, tags: Iterable[str]) -> list[str]:
+        """
+        Удалить все записи с любым из тегов, вернуть удалённые ключи
+        """
+        ...
+
+    async def cleanup_tags(self) -> int:
+        """
+        Убрать из тегов ключи истёкших записей, вернуть их количество
+        """
+        return 0
+
+
+class CodecABC(ABC):
+    """
+    Способ сериализации значений кэша. id записывается первым байтом записи,
+    поэтому по нему запись можно прочитать независимо от настроек метода.
+    """
+
+    id: int
+    name: str
+
+    @abstractmethod
+    def dumps(self, value: Any) -> bytes:
+        ...
+
+    @abstractmethod
+    def loads(self, data: bytes | bytearray | memoryview) -> Any:
         ...
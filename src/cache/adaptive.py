@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+from array import array
+
+from core.config import CachePolicy, settings
+
+
+class CountMinSketch:
+    """
+    Приблизительные частоты ключей в памяти фиксированного размера: оценка
+    не меньше настоящей частоты и завышена только из-за коллизий.
+    После sample_size добавлений счётчики делятся пополам, чтобы частоты
+    отражали недавние обращения.
+    """
+
+    # 16-битные счётчики: после деления пополам хватает с запасом
+    max_count = 0xFFFF
+
+    def __init__(self, width: int, depth: int, sample_size: int):
+        self.width = width
+        self.depth = depth
+        self.sample_size = sample_size
+        self.additions = 0
+        self._rows = [array('H', bytes(2 * width)) for _ in range(depth)]
+
+    def _indexes(self, key: str) -> list[int]:
+        return [hash((row, key)) % self.width for row in range(self.depth)]
+
+    def add(self, key: str) -> int:
+        """
+        Учесть обращение к ключу, вернуть оценку его частоты
+        """
+        estimate = self.max_count
+        for row, index in zip(self._rows, self._indexes(key)):
+            if row[index] < self.max_count:
+                row[index] += 1
+            estimate = min(estimate, row[index])
+
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            self._age()
+        return estimate
+
+    def estimate(self, key: str) -> int:
+        return min(row[index] for row, index in zip(self._rows, self._indexes(key)))
+
+    def _age(self):
+        self.additions = 0
+        for row in self._rows:
+            for index, count in enumerate(row):
+                row[index] = count >> 1
+
+
+class FixedTTL:
+    """
+    Время жизни без поправки на частоту обращений
+    """
+
+    def touch(self, key: str):
+        pass
+
+    def scale(self, key: str, ttl: float) -> float:
+        return ttl
+
+
+class AdaptiveTTL(FixedTTL):
+    """
+    Время жизни по частоте обращений к ключу: частые ключи живут в
+    hot_factor раз дольше, ключи с одним обращением - в cold_factor раз
+    меньше, а ключи реже admission_threshold в кэш не попадают (ttl 0)
+    """
+
+    def __init__(
+        self,
+        sketch: CountMinSketch,
+        hot_threshold: int,
+        hot_factor: float,
+        cold_factor: float,
+        admission_threshold: int,
+    ):
+        self.sketch = sketch
+        self.hot_threshold = hot_threshold
+        self.hot_factor = hot_factor
+        self.cold_factor = cold_factor
+        self.admission_threshold = admission_threshold
+
+    def touch(self, key: str):
+        self.sketch.add(key)
+
+    def scale(self, key: str, ttl: float) -> float:
+        frequency = self.sketch.estimate(key)
+        if frequency < self.admission_threshold:
+            return 0
+        if frequency >= self.hot_threshold:
+            return ttl * self.hot_factor
+        if frequency <= 1:
+            return ttl * self.cold_factor
+        return ttl
+
+
+def get_ttl_policy(policy: CachePolicy) -> FixedTTL:
+    """
+    Политика времени жизни записей метода: с adaptive_ttl - по частоте
+    обращений, настройки в settings.cache_adaptive_*
+    """
+    if not policy.adaptive_ttl:
+        return FixedTTL()
+
+    width = settings.cache_adaptive_sketch_width
+    return AdaptiveTTL(
+        CountMinSketch(
+            width,
+            settings.cache_adaptive_sketch_depth,
+            sample_size=width * settings.cache_adaptive_sample_factor,
+        ),
+        hot_threshold=settings.cache_adaptive_hot_threshold,
+        hot_factor=settings.cache_adaptive_hot_factor,
+        cold_factor=settings.cache_adaptive_cold_factor,
+        admission_threshold=settings.cache_adaptive_admission_threshold,
+    )
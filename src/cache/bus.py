@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+from typing import Iterable
+from uuid import uuid4
+
+import orjson
+
+from db.redis import RedisClient
+
+from .local import LocalCacheStorage
+
+
+class InvalidationBus:
+    """
+    Рассылка изменённых ключей между воркерами через Redis pub/sub: получив
+    сообщение от другого узла, воркер удаляет эти ключи из своего L1.
+    """
+
+    def __init__(self, client: RedisClient, channel: str, local: LocalCacheStorage):
+        self._client = client
+        self.channel = channel
+        self.local = local
+        # Свои сообщения пропускаем: L1 этого воркера уже обновлён
+        self.node_id = uuid4().hex
+        self._subscribed = False
+
+    async def publish(self, keys: Iterable[str]):
+        keys = list(keys)
+        if keys:
+            message = {'node': self.node_id, 'keys': keys}
+            await self._client.publish(self.channel, orjson.dumps(message))
+
+    async def on_message(self, data: bytes):
+        message = orjson.loads(data)
+        if message['node'] != self.node_id:
+            await self.local.delete_many(message['keys'])
+
+    async def on_subscribe(self):
+        # При переподписке сообщения, отправленные без соединения, потеряны.
+        # Первая подписка L1 не сбрасывает: в нём могут быть записи из снимка,
+        # их возраст ограничен settings.cache_snapshot_max_age_in_seconds
+        if self._subscribed:
+            self.local.clear()
+        self._subscribed = True
@@ -1,18 +1,52 @@
 from __future__ import annotations
 
-import codecs
-import json
+import asyncio
 import logging
+import os
 import pickle
-from datetime import datetime, timedelta
+import random
+import time
+import zlib
 from functools import wraps
-from typing import Any, Callable, cast
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterable,
+    Mapping,
+    Sequence,
+    cast,
+)
+from uuid import UUID, SafeUUID
+
+import orjson
+from pydantic import BaseModel
+from redis.asyncio.client import Pipeline
+from redis.exceptions import WatchError
 
 import core.singleton as utils
-from core.config import settings
+import models.models as models
+from core.config import CachePolicy, settings
 from db.redis import RedisClient, get_manager
 
-from .abc import CacheStorageABC
+from .abc import CacheStorageABC, CodecABC
+from .adaptive import get_ttl_policy
+from .bus import InvalidationBus
+from .keys import (
+    bind_arguments,
+    callable_name,
+    prepare_entity_key,
+    prepare_invalidation_channel,
+    prepare_key,
+    prepare_tag_key,
+)
+from .local import LocalCacheStorage
+from .lock import Fence, LockLostError, RedisLock
+from .policy import get_policy, tag_expiration
+from .singleflight import SingleFlight
+from .snapshot import SnapshotError
+from .stats import CompressionStats
 
 
 class CacheError(Exception):
@@ -23,22 +57,391 @@ class CacheError(Exception):
     ...
 
 
+class PickleCodec(CodecABC):
+    id = 1
+    name = 'pickle'
+
+    def dumps(self, value: Any) -> bytes:
+        return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def loads(self, data: bytes | bytearray | memoryview) -> Any:
+        return pickle.loads(data)
+
+
+class ORJSONCodec(CodecABC):
+    """
+    JSON через orjson. Pydantic-модель сохраняется компактно, как
+    {"__model__": [имя класса, значения полей по порядку]}, и
+    восстанавливается без повторной валидации: в кэш она попадает уже
+    провалидированной. Вложенные модели ищутся только в полях, тип которых -
+    модель, поэтому при чтении не обходится каждое значение.
+    """
+
+    id = 2
+    name = 'orjson'
+    model_tag = '__model__'
+
+    def __init__(self, model_types: Iterable[type[BaseModel]]):
+        self.models = {model.__name__: ModelLayout(model) for model in model_types}
+
+    def dumps(self, value: Any) -> bytes:
+        return orjson.dumps(value, default=self._default)
+
+    def loads(self, data: bytes | bytearray | memoryview) -> Any:
+        return self._restore(orjson.loads(data))
+
+    def _default(self, value: Any) -> Any:
+        name = type(value).__name__
+        layout = self.models.get(name)
+        if layout is None or not isinstance(value, BaseModel):
+            raise TypeError(f"Type is not JSON serializable: {name}")
+        fields = value.__dict__
+        return {self.model_tag: [name, *[fields[key] for key in layout.fields]]}
+
+    def _restore(self, value: Any) -> Any:
+        if type(value) is list:
+            return [
+                self._restore(item) if type(item) in (list, dict) else item
+                for item in value
+            ]
+        if type(value) is not dict:
+            return value
+
+        packed = value.get(self.model_tag)
+        if packed is None:
+            return {key: self._restore(item) for key, item in value.items()}
+
+        layout = self.models[packed[0]]
+        fields = dict(zip(layout.fields, packed[1:]))
+        for key in layout.uuid_fields:
+            if type(fields[key]) is str:
+                fields[key] = restore_uuid(fields[key])
+        for key in layout.model_fields:
+            if type(fields[key]) in (list, dict):
+                fields[key] = self._restore(fields[key])
+
+        # Как при распаковке pickle: модель собирается из полного __dict__
+        instance = layout.model.__new__(layout.model)
+        object.__setattr__(instance, '__dict__', fields)
+        object.__setattr__(instance, '__fields_set__', layout.fields_set.copy())
+        return instance
+
+
+class ModelLayout:
+    """
+    Порядок полей модели для ORJSONCodec и поля, которые нужно восстановить
+    после orjson: UUID (orjson отдаёт их строками) и вложенные модели
+    """
+
+    def __init__(self, model: type[BaseModel]):
+        self.model = model
+        self.fields = tuple(model.__fields__)
+        self.fields_set = set(self.fields)
+        self.uuid_fields = tuple(
+            key for key, field in model.__fields__.items() if field.type_ is UUID
+        )
+        self.model_fields = tuple(
+            key
+            for key, field in model.__fields__.items()
+            if isinstance(field.type_, type) and issubclass(field.type_, BaseModel)
+        )
+
+
+def restore_uuid(value: str) -> UUID:
+    """
+    UUID из строки orjson без проверок UUID.__init__: так же, как
+    UUID.__setstate__ при распаковке pickle
+    """
+    uuid = object.__new__(UUID)
+    object.__setattr__(uuid, 'int', int(value.replace('-', ''), 16))
+    object.__setattr__(uuid, 'is_safe', SafeUUID.unknown)
+    return uuid
+
+
+# Флаг сжатия в байте заголовка записи, младшие биты хранят id кодека
+COMPRESSED = 0x80
+
+# Реестр кодеков: по имени выбирается кодек метода, по id читается запись
+CODECS: dict[str, CodecABC] = {}
+CODECS_BY_ID: dict[int, CodecABC] = {}
+
+
+def register_codec(codec: CodecABC):
+    if not 0 < codec.id < COMPRESSED:
+        raise CacheError(f"Codec id must be in range 1..{COMPRESSED - 1}")
+    CODECS[codec.name] = codec
+    CODECS_BY_ID[codec.id] = codec
+
+
+def get_codec(name: str) -> CodecABC:
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise CacheError(f"Unknown cache codec {name}")
+
+
+register_codec(PickleCodec())
+register_codec(
+    ORJSONCodec(
+        model
+        for model in vars(models).values()
+        if isinstance(model, type) and issubclass(model, BaseModel)
+    )
+)
+
+
 class RedisCacheStorage(CacheStorageABC):
+    # Сколько ключей обрабатывать за одну команду при обходе тегов
+    batch_size = 500
+
     def __init__(self, redis: RedisClient):
         self._client = redis
 
     async def get(self, key: str) -> bytes | bytearray | memoryview | None:
         value = await self._client.get(key)
-        if not isinstance(value, (bytes, bytearray, memoryview)) and value is not None:
-            raise TypeError(f"Failed to get serialized value for key {key}")
-        return value
+        return self._check_value(key, value)
+
+    async def get_with_ttl(
+        self, key: str
+    ) -> tuple[bytes | bytearray | memoryview | None, float | None]:
+        async with self._client.pipeline(transaction=False) as pipe:
+            pipe.get(key)
+            pipe.pttl(key)
+            value, pttl = await pipe.execute()
 
-    async def set(self, key: str, value: bytes | bytearray | memoryview | None):
+        # pttl < 0: ключа нет (-2) или у него нет срока жизни (-1)
+        ttl = pttl / 1000 if pttl >= 0 else None
+        return self._check_value(key, value), ttl
+
+    async def set(
+        self,
+        key: str,
+        value: bytes | bytearray | memoryview | None,
+        expire: float | None = None,
+        tags: Iterable[str] = (),
+        fence: Fence | None = None,
+    ):
         if not isinstance(value, (bytes, bytearray, memoryview)):
             raise TypeError(
                 f"Expected bytes or None value for key {key}, but have {type(value)}"
             )
-        return self._client.set(key, value)
+        px = max(int(expire * 1000), 1) if expire is not None else None
+        tags = list(tags)
+        if fence is not None:
+            await self._set_fenced(key, value, px, tags, fence)
+            return
+        if not tags:
+            await self._client.set(key, value, px=px)
+            return
+
+        # Ключ запоминается в множестве каждого тега в той же пачке команд
+        async with self._client.pipeline(transaction=False) as pipe:
+            self._queue_set(pipe, key, value, px, tags)
+            await pipe.execute()
+
+    async def _set_fenced(
+        self,
+        key: str,
+        value: bytes | bytearray | memoryview,
+        px: int | None,
+        tags: Iterable[str],
+        fence: Fence,
+    ):
+        # WATCH отменит запись, если блокировку перехватят между проверкой и EXEC
+        async with self._client.pipeline() as pipe:
+            try:
+                await pipe.watch(fence.key)
+                if await pipe.get(fence.key) != str(fence.token).encode():
+                    raise LockLostError(key)
+                pipe.multi()
+                self._queue_set(pipe, key, value, px, tags)
+                await pipe.execute()
+            except WatchError as e:
+                raise LockLostError(key) from e
+
+    @staticmethod
+    def _queue_set(
+        pipe: Pipeline,
+        key: str,
+        value: bytes | bytearray | memoryview,
+        px: int | None,
+        tags: Iterable[str],
+    ):
+        pipe.set(key, value, px=px)
+        tags = list(tags)
+        tag_ttl = tag_expiration() if tags else 0
+        for tag in tags:
+            tag_key = prepare_tag_key(tag)
+            pipe.sadd(tag_key, key)
+            pipe.expire(tag_key, tag_ttl)
+
+    async def delete(self, key: str):
+        await self._client.unlink(key)
+
+    async def get_many(
+        self, keys: Sequence[str]
+    ) -> list[bytes | bytearray | memoryview | None]:
+        if not keys:
+            return []
+        values = await self._client.mget(keys)
+        return [self._check_value(key, value) for key, value in zip(keys, values)]
+
+    async def set_many(
+        self,
+        items: Mapping[str, bytes | bytearray | memoryview],
+        expire: float | None = None,
+        tags: Mapping[str, Iterable[str]] | None = None,
+    ):
+        if not items:
+            return
+
+        px = max(int(expire * 1000), 1) if expire is not None else None
+        tags = tags or {}
+        async with self._client.pipeline(transaction=False) as pipe:
+            for key, value in items.items():
+                self._queue_set(pipe, key, value, px, tags.get(key, ()))
+            await pipe.execute()
+
+    async def delete_many(self, keys: Iterable[str]):
+        keys = list(keys)
+        if keys:
+            await self._client.unlink(*keys)
+
+    async def invalidate_tags(self, tags: Iterable[str]) -> list[str]:
+        removed: list[str] = []
+        for tag in tags:
+            tag_key = prepare_tag_key(tag)
+            keys = self._client.sscan_iter(tag_key, count=self.batch_size)
+            async for batch in batched(keys, self.batch_size):
+                await self._client.unlink(*batch)
+                removed.extend(key.decode() for key in batch)
+            await self._client.unlink(tag_key)
+        return removed
+
+    async def cleanup_tags(self) -> int:
+        """
+        Убрать из множеств тегов ключи уже истёкших записей.
+        Обходит теги через SCAN/SSCAN, не блокируя Redis
+        """
+        removed = 0
+        tag_keys = self._client.scan_iter(
+            match=prepare_tag_key('*'), count=self.batch_size
+        )
+        async for tag_key in tag_keys:
+            keys = self._client.sscan_iter(tag_key, count=self.batch_size)
+            async for batch in batched(keys, self.batch_size):
+                async with self._client.pipeline(transaction=False) as pipe:
+                    for key in batch:
+                        pipe.exists(key)
+                    exists = await pipe.execute()
+                dead = [key for key, found in zip(batch, exists) if not found]
+                if dead:
+                    removed += await self._client.srem(tag_key, *dead)
+        return removed
+
+    def _check_value(
+        self, key: str, value: Any
+    ) -> bytes | bytearray | memoryview | None:
+        if not isinstance(value, (bytes, bytearray, memoryview)) and value is not None:
+            raise TypeError(f"Failed to get serialized value for key {key}")
+        return value
+
+
+class TieredCacheStorage(CacheStorageABC):
+    """
+    Двухуровневое хранилище: локальный кэш воркера (L1) перед общим (L2).
+    Если задан bus, изменённые ключи удаляются из L1 остальных воркеров
+    """
+
+    def __init__(
+        self,
+        local: LocalCacheStorage,
+        remote: CacheStorageABC,
+        bus: InvalidationBus | None = None,
+    ):
+        self.local = local
+        self.remote = remote
+        self.bus = bus
+
+    async def get(self, key: str) -> bytes | bytearray | memoryview | None:
+        value, _ = await self.get_with_ttl(key)
+        return value
+
+    async def get_with_ttl(
+        self, key: str
+    ) -> tuple[bytes | bytearray | memoryview | None, float | None]:
+        value, ttl = await self.local.get_with_ttl(key)
+        if value is not None:
+            return value, ttl
+
+        # L1 не должен хранить запись дольше, чем она живёт в L2
+        value, ttl = await self.remote.get_with_ttl(key)
+        if value is not None:
+            await self.local.set(key, value, ttl)
+        return value, ttl
+
+    async def set(
+        self,
+        key: str,
+        value: bytes | bytearray | memoryview | None,
+        expire: float | None = None,
+        tags: Iterable[str] = (),
+        fence: Fence | None = None,
+    ):
+        await self.remote.set(key, value, expire, tags, fence)
+        await self.local.set(key, value, expire)
+        await self._publish([key])
+
+    async def delete(self, key: str):
+        await self.remote.delete(key)
+        await self.local.delete(key)
+        await self._publish([key])
+
+    async def get_many(
+        self, keys: Sequence[str]
+    ) -> list[bytes | bytearray | memoryview | None]:
+        values = await self.local.get_many(keys)
+        missing = [key for key, value in zip(keys, values) if value is None]
+        if not missing:
+            return values
+
+        found = dict(zip(missing, await self.remote.get_many(missing)))
+        # Срок жизни в L2 здесь неизвестен, в L1 запись живёт не дольше local.expire
+        await self.local.set_many(
+            {key: value for key, value in found.items() if value is not None}
+        )
+        return [
+            found[key] if value is None else value for key, value in zip(keys, values)
+        ]
+
+    async def set_many(
+        self,
+        items: Mapping[str, bytes | bytearray | memoryview],
+        expire: float | None = None,
+        tags: Mapping[str, Iterable[str]] | None = None,
+    ):
+        await self.remote.set_many(items, expire, tags)
+        await self.local.set_many(items, expire)
+        await self._publish(items)
+
+    async def delete_many(self, keys: Iterable[str]):
+        keys = list(keys)
+        await self.remote.delete_many(keys)
+        await self.local.delete_many(keys)
+        await self._publish(keys)
+
+    async def invalidate_tags(self, tags: Iterable[str]) -> list[str]:
+        removed = await self.remote.invalidate_tags(tags)
+        await self.local.delete_many(removed)
+        await self._publish(removed)
+        return removed
+
+    async def cleanup_tags(self) -> int:
+        return await self.remote.cleanup_tags()
+
+    async def _publish(self, keys: Iterable[str]):
+        if self.bus is not None:
+            await self.bus.publish(keys)
 
 
 class Cache(metaclass=utils.Singleton):
@@ -46,73 +449,367 @@ class Cache(metaclass=utils.Singleton):
     Класс-обёртка над redis для работы с cache методов.
     """
 
-    def __init__(self, storage: RedisCacheStorage):
-        self.storage: RedisCacheStorage = storage
+    def __init__(
+        self,
+        storage: CacheStorageABC,
+        local: LocalCacheStorage | None = None,
+        bus: InvalidationBus | None = None,
+        lock: RedisLock | None = None,
+    ):
+        self.storage: CacheStorageABC = storage
+        self.local = local
+        # Блокировки пересчёта между узлами, см. cache_decorator(distributed_lock)
+        self.lock = lock
+        self.tiered = (
+            TieredCacheStorage(local, storage, bus) if local is not None else None
+        )
+        self.compression = CompressionStats()
+
+    def _get_storage(self, local: bool) -> CacheStorageABC:
+        if local and self.tiered is not None:
+            return self.tiered
+        return self.storage
 
-    async def get(self, key: str) -> Any:
+    def get_stats(self) -> dict[str, Any]:
         """
-        Получить значение из cache по ключу key с отметкой о том, когда было положено
+        Статистика локального кэша воркера и сжатия значений
         """
-        serialized = await self.storage.get(key)
-        if serialized is None:
-            return serialized
+        stats: dict[str, Any] = {'compression': self.compression.as_dict()}
+        if self.local is not None:
+            stats['local'] = {**self.local.stats.as_dict(), 'size': len(self.local)}
+        return stats
+
+    async def get(self, key: str, local: bool = False, default: Any = None) -> Any:
+        """
+        Получить значение из cache по ключу key. Если ключа нет, вернётся
+        default, что позволяет отличить его от закэшированного None
+        """
+        serialized = await self._get_storage(local).get(key)
+        return self._loads(key, serialized, default)
+
+    async def get_with_ttl(
+        self, key: str, local: bool = False, default: Any = None
+    ) -> tuple[Any, float | None]:
+        """
+        Получить значение из cache по ключу key и оставшееся время его жизни
+        """
+        serialized, ttl = await self._get_storage(local).get_with_ttl(key)
+        return self._loads(key, serialized, default), ttl
+
+    async def set(
+        self,
+        key: str,
+        value: Any,
+        expire: float | None = None,
+        local: bool = False,
+        codec: str | None = None,
+        tags: Iterable[str] = (),
+        fence: Fence | None = None,
+        max_size: int | None = None,
+    ):
+        """
+        Положить значение в cache на expire секунд, пометив его тегами.
+        С fence запись делается, только пока блокировка пересчёта наша.
+        Записи больше max_size байт не кэшируются
+        """
+        state = self._encode(key, value, get_codec(codec or settings.cache_codec))
+        if state is None:
+            return
+        if max_size and len(state) > max_size:
+            logging.debug("Value for key %s is too large to cache", key)
+            return
+        await self._get_storage(local).set(key, state, expire, tags, fence)
+
+    async def get_many(
+        self, keys: Sequence[str], local: bool = False, default: Any = None
+    ) -> list[Any]:
+        """
+        Получить значения по ключам одним запросом (MGET), default для
+        отсутствующих
+        """
+        serialized = await self._get_storage(local).get_many(keys)
+        return [self._loads(key, item, default) for key, item in zip(keys, serialized)]
 
-        value = None
+    async def set_many(
+        self,
+        items: Mapping[str, Any],
+        expire: float | None = None,
+        local: bool = False,
+        codec: str | None = None,
+        tags: Mapping[str, Iterable[str]] | None = None,
+        max_size: int | None = None,
+    ) -> bool:
+        """
+        Положить несколько значений одной пачкой команд. Если вместе они
+        больше max_size байт, не кэшируется ни одно. Возвращает, записаны ли
+        """
+        default_codec = get_codec(codec or settings.cache_codec)
+        encoded = {
+            key: self._encode(key, value, default_codec) for key, value in items.items()
+        }
+        states = {key: state for key, state in encoded.items() if state is not None}
+        if max_size and sum(map(len, states.values())) > max_size:
+            logging.debug("%d values are too large to cache", len(states))
+            return False
+        await self._get_storage(local).set_many(states, expire, tags)
+        return True
+
+    async def delete_many(self, keys: Iterable[str], local: bool = False):
+        await self._get_storage(local).delete_many(keys)
+
+    async def invalidate_tags(self, tags: Iterable[str]) -> int:
+        """
+        Удалить все записи, помеченные любым из тегов, в том числе из L1
+        """
+        removed = await self._get_storage(local=True).invalidate_tags(tags)
+        return len(removed)
+
+    async def cleanup_tags(self) -> int:
+        """
+        Убрать из тегов ключи истёкших записей
+        """
+        return await self.storage.cleanup_tags()
+
+    def save_snapshot(self, path: str, limit: int | None = None):
+        """
+        Сохранить самые свежие записи L1 в файл, чтобы после перезапуска
+        воркер начинал с тёплым кэшем
+        """
+        if self.local is None:
+            return
         try:
-            if not isinstance(serialized, (bytes, bytearray, memoryview)):
-                raise TypeError(f"Failed to deserialize value for key {key}")
-            value = pickle.loads(serialized)
-        except (TypeError, pickle.PicklingError) as e:
+            saved = self.local.dump(path, limit)
+        except OSError as e:
+            logging.error("Failed to save cache snapshot: %s", e)
+            return
+        logging.info("Saved %d cache entries to %s", saved, path)
+
+    def load_snapshot(self, path: str, max_age: float):
+        """
+        Загрузить в L1 записи из снимка, если он не старше max_age секунд
+        """
+        if self.local is None or not os.path.exists(path):
+            return
+        try:
+            loaded = self.local.load(path, max_age)
+        except (OSError, SnapshotError) as e:
+            logging.error("Failed to load cache snapshot: %s", e)
+            return
+        logging.info("Loaded %d cache entries from %s", loaded, path)
+
+    def _encode(self, key: str, value: Any, codec: CodecABC) -> bytes | None:
+        """
+        Запись для хранилища, None - значение не кэшируется
+        """
+        try:
+            return self._pack(*self._dumps(key, value, codec))
+        except CacheError as e:
             logging.error(e)
-        return value
+            return None
+
+    def _dumps(self, key: str, value: Any, codec: CodecABC) -> tuple[int, bytes]:
+        try:
+            return codec.id, codec.dumps(value)
+        except (TypeError, pickle.PicklingError) as e:
+            if codec.name == PickleCodec.name:
+                raise CacheError(f"Failed to set an object for key {key}: {e}")
+            if not settings.cache_allow_pickle:
+                # Запись в pickle потом не прочитать
+                raise CacheError(
+                    f"Codec {codec.name} can't encode value for key {key}: {e}"
+                )
 
-    async def set(self, key: str, value: Any):
+        # Значения, которые кодек не поддерживает, сохраняем через pickle
+        logging.debug("Falling back to pickle for key %s", key)
+        return self._dumps(key, value, get_codec(PickleCodec.name))
+
+    def _pack(self, codec_id: int, payload: bytes) -> bytes:
         """
-        Положить значение в cache
+        Добавить байт заголовка, сжав большие значения
         """
+        threshold = settings.cache_compression_threshold_bytes
+        if threshold and len(payload) >= threshold:
+            started = time.perf_counter()
+            compressed = zlib.compress(payload, settings.cache_compression_level)
+            self.compression.compress_time += time.perf_counter() - started
+            if len(compressed) < len(payload):
+                self.compression.compressed += 1
+                self.compression.raw_bytes += len(payload)
+                self.compression.compressed_bytes += len(compressed)
+                return bytes((codec_id | COMPRESSED,)) + compressed
+            # Сжатие не помогло, значение хранится как есть
+            self.compression.discarded += 1
+        return bytes((codec_id,)) + payload
+
+    def _loads(self, key: str, serialized: Any, default: Any = None) -> Any:
+        if serialized is None:
+            return default
+
+        # Нечитаемая запись считается отсутствующей
+        value = default
         try:
-            state = pickle.dumps(value)
-        except pickle.UnpicklingError as e:
+            if not isinstance(serialized, (bytes, bytearray, memoryview)):
+                raise TypeError(f"Failed to deserialize value for key {key}")
+            value = self._decode(key, memoryview(serialized))
+        except (
+            TypeError,
+            ValueError,
+            CacheError,
+            pickle.UnpicklingError,
+            zlib.error,
+        ) as e:
             logging.error(e)
-            raise CacheError("Failed to set an object")
-        await self.storage.set(key, state)
+        return value
+
+    def _decode(self, key: str, serialized: memoryview) -> Any:
+        header, payload = serialized[0], serialized[1:]
+        if header & COMPRESSED:
+            started = time.perf_counter()
+            payload = memoryview(zlib.decompress(payload))
+            self.compression.decompress_time += time.perf_counter() - started
+            self.compression.decompressed += 1
+
+        codec = CODECS_BY_ID.get(header & ~COMPRESSED)
+        if codec is None:
+            raise CacheError(f"Unknown codec of value for key {key}")
+        if codec.name == PickleCodec.name and not settings.cache_allow_pickle:
+            raise CacheError(f"Pickled values are not allowed, key {key}")
+        return codec.loads(payload)
 
     @classmethod
     def get_instance(cls) -> Cache | None:
         return cast(Cache, cls._instances.get(cls))
 
 
-def expired(timestamp: datetime) -> bool:
-    delta = timedelta(seconds=settings.cache_expiration_in_seconds)
-    if datetime.now() - timestamp >= delta:
+# Признак отсутствия ключа в кэше, в отличие от закэшированного None
+MISSING = object()
+
+# Результат для идентификатора, который не удалось получить из-за ошибки:
+# cache_many_decorator его не кэширует и отдаёт вызывающему None
+FAILED = object()
+
+
+class EntityCache:
+    """
+    Нормализованное хранение списков моделей поверх Cache: запись списка
+    хранит только упорядоченные id, а сами модели лежат в общих записях
+    сущностей kind, которые читаются и пишутся пачкой. Список, в котором
+    не хватает сущности, считается промахом и пересчитывается.
+    Сущность помечается тегом <kind>:<id>, поэтому сброс одной сущности
+    удаляет одну запись, а не все списки с ней.
+    max_size записи списка ограничивает суммарный размер его сущностей:
+    сам список id мал при любом размере страницы.
+    """
+
+    def __init__(self, cache: Cache, kind: str):
+        self.cache = cache
+        self.kind = kind
+
+    @property
+    def lock(self) -> RedisLock | None:
+        return self.cache.lock
+
+    async def get(self, key: str, local: bool = False, default: Any = None) -> Any:
+        value, _ = await self.get_with_ttl(key, local, default)
+        return value
+
+    async def get_with_ttl(
+        self, key: str, local: bool = False, default: Any = None
+    ) -> tuple[Any, float | None]:
+        ids, ttl = await self.cache.get_with_ttl(key, local, default)
+        if not isinstance(ids, list):
+            return ids, ttl
+
+        keys = [prepare_entity_key(self.kind, entity_id) for entity_id in ids]
+        entities = await self.cache.get_many(keys, local, default=MISSING)
+        # None - сущность, которой не было при чтении по id, а теперь есть в списке
+        if any(entity is MISSING or entity is None for entity in entities):
+            return default, None
+        return entities, ttl
+
+    async def set(
+        self, key: str, value: Any, expire: float | None = None, **kwargs
+    ) -> None:
+        if isinstance(value, list):
+            entities = {prepare_entity_key(self.kind, item.id): item for item in value}
+            tags = {
+                entity_key: [f'{self.kind}:{item.id}']
+                for entity_key, item in entities.items()
+            }
+            stored = await self.cache.set_many(
+                entities,
+                expiration(settings.cache_entity_expiration_in_seconds),
+                local=kwargs.get('local', False),
+                codec=kwargs.get('codec'),
+                tags=tags,
+                max_size=kwargs.pop('max_size', None),
+            )
+            if not stored:
+                return
+            value = [str(item.id) for item in value]
+        await self.cache.set(key, value, expire, **kwargs)
+
+
+def is_negative(response: Any) -> bool:
+    """
+    Отрицательный результат: ничего не найдено
+    """
+    if response is None:
         return True
+    return isinstance(response, (list, tuple, dict, set)) and not response
 
-    return False
 
+async def batched(items: AsyncIterator[Any], size: int) -> AsyncIterator[list[Any]]:
+    batch = []
+    async for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
-def is_serializable(thing: Any) -> bool:
-    try:
-        json.dumps(thing)
-    except TypeError:
-        return False
-    return True
 
+def build_tags(
+    func: Callable,
+    tags: Iterable[str],
+    result_tag: str | None,
+    response: Any,
+    *args,
+    **kwargs,
+) -> list[str]:
+    """
+    Теги записи: шаблоны tags, заполненные аргументами вызова
+    (например genre:{genre_id}), и <result_tag>:<id> для каждой модели ответа
+    """
+    built = []
+    if tags:
+        arguments = bind_arguments(func, *args, **kwargs)
+        built.extend(tag.format(**arguments) for tag in tags)
 
-def prepare_key(func: Callable, *args, **kwargs) -> str:
-    key = {'callable': func.__name__, 'args': args, 'kwargs': sorted(kwargs.items())}
-    serialized = ""
-    try:
-        serialized = json.dumps(key)
-    except TypeError:
-        # if can't encode straight to json, we need to encode to base64 first
-        if not is_serializable(key['args']):
-            key['args'] = codecs.encode(pickle.dumps(key['args']), 'base64').decode()
-        if not is_serializable(key['kwargs']):
-            key['kwargs'] = codecs.encode(
-                pickle.dumps(key['kwargs']), 'base64'
-            ).decode()
-    serialized = json.dumps(key)
-    return serialized
+    if result_tag and response is not None:
+        items = response if isinstance(response, (list, tuple)) else [response]
+        built.extend(f'{result_tag}:{item.id}' for item in items if hasattr(item, 'id'))
+    return built
+
+
+def response_expiration(response: Any, policy: CachePolicy) -> float:
+    """
+    Время жизни результата по политике: для пустых короче
+    """
+    if is_negative(response):
+        ttl = policy.negative_expiration_in_seconds
+    else:
+        ttl = policy.expiration_in_seconds
+    return expiration(cast(int, ttl))
+
+
+def expiration(ttl: float) -> float:
+    """
+    Время жизни записи со случайной добавкой, чтобы записи, положенные
+    одновременно, не истекали тоже одновременно
+    """
+    return ttl * (1 + random.uniform(0, settings.cache_expiration_jitter))
 
 
 def get_cache() -> Cache:
@@ -125,26 +822,296 @@ def get_cache() -> Cache:
 
     redis_manager = get_manager()
     storage = RedisCacheStorage(redis_manager.get_client())
-    return Cache(storage)
+    local = LocalCacheStorage(
+        max_size=settings.cache_local_max_size,
+        expire=settings.cache_local_expiration_in_seconds,
+    )
+    bus = None
+    if settings.cache_invalidation_enabled:
+        bus = InvalidationBus(
+            redis_manager.get_client(), prepare_invalidation_channel(), local
+        )
+        redis_manager.subscribe(bus.channel, bus.on_message, bus.on_subscribe)
+    lock = RedisLock(redis_manager.get_client(), settings.cache_lock_timeout_in_seconds)
+    return Cache(storage, local, bus, lock)
+
+
+def _log_refresh_error(call: asyncio.Future):
+    if not call.cancelled() and call.exception() is not None:
+        logging.error("Failed to refresh cache entry: %s", call.exception())
+
+
+async def _wait_for_value(
+    cache_storage: Cache | EntityCache, key: str, local: bool
+) -> Any:
+    """
+    Ждать, пока другой узел положит значение по ключу, MISSING по таймауту
+    """
+    deadline = time.monotonic() + settings.cache_lock_wait_in_seconds
+    while time.monotonic() < deadline:
+        await asyncio.sleep(settings.cache_lock_poll_interval_in_seconds)
+        response = await cache_storage.get(key, local=local, default=MISSING)
+        if response is not MISSING:
+            return response
+    return MISSING
+
+
+async def _store(
+    cache_storage: Cache | EntityCache,
+    key: str,
+    response: Any,
+    ttl: float,
+    grace: float,
+    **kwargs,
+):
+    """
+    Положить результат на ttl + grace секунд, ttl 0 - не кэшировать
+    """
+    if not ttl:
+        return
+    try:
+        await cache_storage.set(key, response, expire=ttl + grace, **kwargs)
+    except LockLostError:
+        logging.warning("Recompute lock for %s expired, result not cached", key)
 
 
-def cache_decorator(cache_storage: Cache = get_cache()) -> Callable:
+async def _load_with_lock(
+    lock: RedisLock | None,
+    cache_storage: Cache | EntityCache,
+    key: str,
+    local: bool,
+    stale: bool,
+    load: Callable[[Fence | None], Awaitable[Any]],
+) -> Any:
     """
-    Декоратор для кэширования результатов вызываемого объекта
+    Пересчитать значение под распределённой блокировкой lock. Если её держит
+    другой узел, устаревшее значение не обновляем, а при промахе ждём его
+    результат и пересчитываем сами, только если он не успел
     """
+    if lock is None:
+        return await load(None)
+
+    fence = await lock.acquire(key)
+    if fence is None:
+        if stale:
+            return MISSING
+        response = await _wait_for_value(cache_storage, key, local)
+        if response is not MISSING:
+            return response
+        return await load(None)
+
+    try:
+        return await load(fence)
+    finally:
+        await lock.release(fence)
+
+
+def cache_decorator(
+    cache_storage: Cache = get_cache(),
+    local: bool | None = None,
+    stale_while_revalidate: bool = False,
+    codec: str | None = None,
+    tags: Iterable[str] = (),
+    result_tag: str | None = None,
+    distributed_lock: bool = False,
+    entity: str | None = None,
+) -> Callable:
+    """
+    Декоратор для кэширования результатов вызываемого объекта.
+    Одновременные промахи по одному ключу объединяются в один вызов.
+    Время жизни, ограничение размера, уровень кэша и отключение задаются
+    политикой метода в settings.cache_policies, local переопределяет уровень.
+    С adaptive_ttl политики время жизни зависит от частоты обращений к ключу,
+    см. AdaptiveTTL.
+    С stale_while_revalidate устаревшее значение ещё
+    settings.cache_stale_while_revalidate_in_seconds отдаётся сразу,
+    а обновляется в фоне.
+    codec задаёт кодек значений (по умолчанию settings.cache_codec).
+    Пустые результаты (None, пустые списки) тоже кэшируются, но на
+    negative_expiration_in_seconds политики.
+    tags и result_tag задают теги записи для выборочного сброса, см. build_tags
+    С distributed_lock при промахе пересчитывает только узел, захвативший
+    блокировку в Redis: остальные ждут его результат до
+    settings.cache_lock_wait_in_seconds, а при фоновом обновлении продолжают
+    отдавать устаревшее значение.
+    entity включает нормализованное хранение списка моделей, см. EntityCache
+    """
+    grace = settings.cache_stale_while_revalidate_in_seconds
+    storage = EntityCache(cache_storage, entity) if entity else cache_storage
 
     def decorator(func: Callable) -> Callable:
+        policy = get_policy(callable_name(func))
+        if not policy.enabled:
+            return func
+        use_local = policy.tier == 'local' if local is None else local
+        ttl_policy = get_ttl_policy(policy)
+
+        use_lock = distributed_lock and storage.lock is not None
+        # С stale_while_revalidate Redis хранит запись ещё grace секунд
+        # после её устаревания
+        keep_stale = grace if stale_while_revalidate else 0
+
+        # Одновременные промахи по одному ключу делают один вызов func.
+        # Фоновые обновления идут отдельно: при занятой блокировке они
+        # возвращают MISSING, и промах не должен получить его как значение
+        in_flight = SingleFlight()
+        refreshing = SingleFlight()
+
+        async def load(key: str, fence: Fence | None, *args, **kwargs) -> Any:
+            response = await func(*args, **kwargs)
+            await _store(
+                storage,
+                key,
+                response,
+                ttl=ttl_policy.scale(key, response_expiration(response, policy)),
+                grace=keep_stale,
+                local=use_local,
+                codec=codec,
+                max_size=policy.max_payload_in_bytes,
+                tags=build_tags(func, tags, result_tag, response, *args, **kwargs),
+                fence=fence,
+            )
+            return response
+
+        async def recompute(key: str, stale: bool, *args, **kwargs) -> Any:
+            return await _load_with_lock(
+                storage.lock if use_lock else None,
+                storage,
+                key,
+                use_local,
+                stale,
+                lambda fence: load(key, fence, *args, **kwargs),
+            )
+
         @wraps(func)
         async def inner(*args, **kwargs):
             key = prepare_key(func, *args, **kwargs)
-            cached_response = await cache_storage.get(key)
-            response = cached_response.get('response') if cached_response else None
-            if not response or expired(cached_response.get('timestamp')):
-                response = await func(*args, **kwargs)
-                state = {'timestamp': datetime.now(), 'response': response}
-                await cache_storage.set(key, state)
+            ttl_policy.touch(key)
+            response, ttl = await storage.get_with_ttl(
+                key, local=use_local, default=MISSING
+            )
+            if response is MISSING:
+                return await in_flight.do(
+                    key, lambda: recompute(key, False, *args, **kwargs)
+                )
+
+            stale = ttl is not None and ttl <= grace
+            if stale_while_revalidate and stale:
+                refresh = refreshing.start(
+                    key, lambda: recompute(key, True, *args, **kwargs)
+                )
+                refresh.add_done_callback(_log_refresh_error)
             return response
 
         return inner
 
     return decorator
+
+
+def cache_many_decorator(
+    cache_storage: Cache = get_cache(),
+    ids_argument: str = 'item_ids',
+    local: bool | None = None,
+    codec: str | None = None,
+    tags: Iterable[str] = (),
+    result_tag: str | None = None,
+    entity: str | None = None,
+) -> Callable:
+    """
+    Декоратор для методов, принимающих список идентификаторов в аргументе
+    ids_argument и возвращающих список результатов в том же порядке
+    (None для ненайденных). Каждый результат кэшируется под своим ключом,
+    в func передаются только идентификаторы, которых нет в кэше.
+    Время жизни и уровень кэша задаются политикой метода, как в
+    cache_decorator, ненайденные идентификаторы кэшируются на
+    negative_expiration_in_seconds политики, а результаты FAILED (ошибка
+    при получении) не кэшируются вовсе и возвращаются как None.
+    Шаблоны tags заполняются аргументами вызова, в которых ids_argument
+    заменён одним идентификатором (например person:{person_ids}).
+    С entity результаты хранятся в общих записях сущностей, тех же, что у
+    нормализованных списков cache_decorator(entity=...), и помечаются тегом
+    <entity>:<id>. Результат тогда должен зависеть только от идентификатора.
+    """
+    result_tag = result_tag or entity
+
+    def decorator(func: Callable) -> Callable:
+        policy = get_policy(callable_name(func))
+        if not policy.enabled:
+            return func
+        use_local = policy.tier == 'local' if local is None else local
+
+        @wraps(func)
+        async def inner(*args, **kwargs):
+            arguments = bind_arguments(func, *args, **kwargs)
+            ids = list(arguments[ids_argument])
+            keys = _item_keys(func, arguments, ids_argument, ids, entity)
+            cached = await cache_storage.get_many(
+                keys, local=use_local, default=MISSING
+            )
+            results = dict(zip(keys, cached))
+
+            missing = {
+                key: id_ for key, id_ in zip(keys, ids) if results[key] is MISSING
+            }
+            if missing:
+                loaded = await func(
+                    **{**arguments, ids_argument: list(missing.values())}
+                )
+                loaded = dict(zip(missing, loaded))
+                item_tags = {
+                    key: build_tags(
+                        func,
+                        tags,
+                        result_tag,
+                        loaded[key],
+                        **{**arguments, ids_argument: id_},
+                    )
+                    for key, id_ in missing.items()
+                }
+                await _store_many(
+                    cache_storage, loaded, item_tags, policy, use_local, codec
+                )
+                results.update(loaded)
+
+            return [None if results[key] is FAILED else results[key] for key in keys]
+
+        return inner
+
+    return decorator
+
+
+def _item_keys(
+    func: Callable,
+    arguments: dict[str, Any],
+    ids_argument: str,
+    ids: list[Any],
+    entity: str | None,
+) -> list[str]:
+    if entity:
+        return [prepare_entity_key(entity, id_) for id_ in ids]
+    return [prepare_key(func, **{**arguments, ids_argument: id_}) for id_ in ids]
+
+
+async def _store_many(
+    cache_storage: Cache,
+    items: dict[str, Any],
+    tags: dict[str, list[str]],
+    policy: CachePolicy,
+    local: bool,
+    codec: str | None,
+):
+    items = {key: value for key, value in items.items() if value is not FAILED}
+    found = {key: value for key, value in items.items() if not is_negative(value)}
+    not_found = {key: value for key, value in items.items() if is_negative(value)}
+    for part, ttl in (
+        (found, policy.expiration_in_seconds),
+        (not_found, policy.negative_expiration_in_seconds),
+    ):
+        if part:
+            await cache_storage.set_many(
+                part,
+                expiration(cast(int, ttl)),
+                local=local,
+                codec=codec,
+                tags={key: tags[key] for key in part},
+            )
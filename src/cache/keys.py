@@ -0,0 +1,144 @@
+import hashlib
+import inspect
+from datetime import date
+from enum import Enum
+from functools import lru_cache
+from typing import Any, Callable
+from uuid import UUID
+
+import orjson
+from pydantic import BaseModel
+
+from core.config import settings
+from core.sorting import parse_sort
+
+# Версия схемы ключей и содержимого кэша. Увеличивается при несовместимом
+# изменении формата, чтобы новые воркеры не читали старые записи.
+CACHE_KEY_VERSION = 4
+
+# Аргументы, которые не влияют на результат и не попадают в ключ
+SKIPPED_ARGUMENTS = frozenset({'self', 'cls'})
+# Аргументы сортировки, приводимые к виду field:asc/field:desc
+SORT_ARGUMENTS = frozenset({'sort', 'sort_order'})
+
+
+def callable_name(func: Callable) -> str:
+    """
+    Имя вызываемого объекта вместе с классом, например FilmElasticStorage.get_item
+    """
+    return getattr(func, '__qualname__', func.__name__)
+
+
+def canonicalize(value: Any) -> Any:
+    """
+    Привести аргумент к детерминированному JSON-совместимому виду
+    """
+    if hasattr(value, '__cache_key__'):
+        return canonicalize(value.__cache_key__())
+
+    match value:
+        case None | bool() | int() | float() | str():
+            return value
+        case UUID() | date():
+            return str(value)
+        case Enum():
+            return canonicalize(value.value)
+        case BaseModel():
+            return canonicalize(value.dict())
+        case dict():
+            return {str(k): canonicalize(v) for k, v in value.items()}
+        case set() | frozenset():
+            return sorted((canonicalize(item) for item in value), key=orjson.dumps)
+        case list() | tuple():
+            return [canonicalize(item) for item in value]
+
+    raise TypeError(f"Can't build cache key from {type(value).__name__}")
+
+
+@lru_cache(maxsize=None)
+def _signature(func: Callable) -> inspect.Signature | None:
+    try:
+        return inspect.signature(func)
+    except (TypeError, ValueError):
+        return None
+
+
+def bind_arguments(func: Callable, *args, **kwargs) -> dict[str, Any]:
+    """
+    Аргументы вызова по именам параметров, с учётом значений по умолчанию,
+    чтобы позиционный и именованный вызов давали один ключ
+    """
+    signature = _signature(func)
+    if signature is None:
+        return {'args': args, 'kwargs': kwargs}
+
+    try:
+        bound = signature.bind(*args, **kwargs)
+    except TypeError:
+        return {'args': args, 'kwargs': kwargs}
+
+    bound.apply_defaults()
+    return dict(bound.arguments)
+
+
+def prepare_key(func: Callable, *args, **kwargs) -> str:
+    """
+    Ключ вида <префикс>:v<версия>:<Класс.метод>:<хеш аргументов>
+    """
+    arguments = {}
+    is_function = inspect.isfunction(func)
+    for name, value in bind_arguments(func, *args, **kwargs).items():
+        if is_function and name in SKIPPED_ARGUMENTS:
+            continue
+        if name in SORT_ARGUMENTS and (value is None or isinstance(value, str)):
+            value = parse_sort(value)
+        arguments[name] = canonicalize(value)
+
+    serialized = orjson.dumps(arguments, option=orjson.OPT_SORT_KEYS)
+    digest = hashlib.blake2b(serialized, digest_size=16).hexdigest()
+    return ':'.join(
+        (
+            settings.cache_key_prefix,
+            f'v{CACHE_KEY_VERSION}',
+            callable_name(func),
+            digest,
+        )
+    )
+
+
+def prepare_entity_key(kind: str, entity_id: Any) -> str:
+    """
+    Ключ общей записи сущности, например фильма, на которую ссылаются
+    нормализованные списки
+    """
+    return ':'.join(
+        (
+            settings.cache_key_prefix,
+            f'v{CACHE_KEY_VERSION}',
+            'entity',
+            kind,
+            str(entity_id),
+        )
+    )
+
+
+def prepare_tag_key(tag: str) -> str:
+    """
+    Ключ множества записей с тегом tag. Не зависит от версии схемы, чтобы
+    сброс по тегу затрагивал и записи предыдущих версий
+    """
+    return f'{settings.cache_key_prefix}:tag:{tag}'
+
+
+def prepare_invalidation_channel() -> str:
+    """
+    Канал pub/sub, по которому воркеры сообщают об изменённых ключах
+    """
+    return f'{settings.cache_key_prefix}:invalidate'
+
+
+def prepare_lock_key(key: str) -> str:
+    """
+    Ключ блокировки пересчёта записи key
+    """
+    return f'{settings.cache_key_prefix}:lock:{key}'
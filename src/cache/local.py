@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Iterable, Mapping, Sequence
+
+from .abc import CacheStorageABC
+from .snapshot import SnapshotRecord, read_snapshot, write_snapshot
+from .stats import CacheStats
+
+if TYPE_CHECKING:
+    from .lock import Fence
+
+
+class LocalCacheStorage(CacheStorageABC):
+    """
+    In-process кэш воркера: LRU с ограничением по числу записей и TTL.
+    Хранит сериализованные значения, чтобы вызывающий код не мог изменить
+    общий для всех запросов объект.
+    """
+
+    def __init__(self, max_size: int, expire: float):
+        self.max_size = max_size
+        self.expire = expire
+        self.stats = CacheStats()
+        # key -> (когда вытеснить из L1, когда истекает запись, значение)
+        self._data: OrderedDict[str, tuple[float, float | None, bytes]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    async def get(self, key: str) -> bytes | bytearray | memoryview | None:
+        value, _ = await self.get_with_ttl(key)
+        return value
+
+    async def get_with_ttl(
+        self, key: str
+    ) -> tuple[bytes | bytearray | memoryview | None, float | None]:
+        item = self._data.get(key)
+        if item is None:
+            self.stats.misses += 1
+            return None, None
+
+        evict_at, expires_at, value = item
+        now = time.monotonic()
+        if evict_at <= now:
+            del self._data[key]
+            self.stats.expirations += 1
+            self.stats.misses += 1
+            return None, None
+
+        self._data.move_to_end(key)
+        self.stats.hits += 1
+        return value, None if expires_at is None else expires_at - now
+
+    async def set(
+        self,
+        key: str,
+        value: bytes | bytearray | memoryview | None,
+        expire: float | None = None,
+        tags: Iterable[str] = (),
+        fence: Fence | None = None,
+    ):
+        if value is None:
+            self._data.pop(key, None)
+            return
+
+        now = time.monotonic()
+        expires_at = None if expire is None else now + expire
+        evict_at = now + self.expire
+        if expires_at is not None:
+            evict_at = min(evict_at, expires_at)
+
+        self._data[key] = (evict_at, expires_at, bytes(value))
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.stats.evictions += 1
+
+    async def delete(self, key: str):
+        self._data.pop(key, None)
+
+    async def get_many(
+        self, keys: Sequence[str]
+    ) -> list[bytes | bytearray | memoryview | None]:
+        return [await self.get(key) for key in keys]
+
+    async def set_many(
+        self,
+        items: Mapping[str, bytes | bytearray | memoryview],
+        expire: float | None = None,
+        tags: Mapping[str, Iterable[str]] | None = None,
+    ):
+        for key, value in items.items():
+            await self.set(key, value, expire)
+
+    async def delete_many(self, keys: Iterable[str]):
+        for key in keys:
+            self._data.pop(key, None)
+
+    async def invalidate_tags(self, tags: Iterable[str]) -> list[str]:
+        """
+        Локальный кэш не хранит теги: ключи для удаления из L1 берутся из L2
+        """
+        return []
+
+    def clear(self):
+        self._data.clear()
+
+    def dump(self, path: str, limit: int | None = None) -> int:
+        """
+        Сохранить в снимок limit последних использованных записей,
+        вернуть их количество
+        """
+        now, wall = time.monotonic(), time.time()
+        items = list(self._data.items())
+        if limit is not None:
+            items = items[-limit:] if limit else []
+        records = [
+            SnapshotRecord(
+                key,
+                wall + evict_at - now,
+                None if expires_at is None else wall + expires_at - now,
+                value,
+            )
+            for key, (evict_at, expires_at, value) in items
+            if evict_at > now
+        ]
+        write_snapshot(path, wall, records)
+        return len(records)
+
+    def load(self, path: str, max_age: float) -> int:
+        """
+        Загрузить записи из снимка не старше max_age секунд, пропуская
+        истёкшие, вернуть число загруженных
+        """
+        now, wall = time.monotonic(), time.time()
+        created_at, records = read_snapshot(path)
+        if wall - created_at > max_age:
+            return 0
+
+        loaded = 0
+        for record in records:
+            if record.evict_at <= wall:
+                continue
+            evict_at = min(now + record.evict_at - wall, now + self.expire)
+            expires_at = record.expires_at
+            if expires_at is not None:
+                expires_at = now + expires_at - wall
+            self._data[record.key] = (evict_at, expires_at, record.value)
+            self._data.move_to_end(record.key)
+            loaded += 1
+
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+        return loaded
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+from typing import NamedTuple
+
+from redis.exceptions import WatchError
+
+from db.redis import RedisClient
+
+from .keys import prepare_lock_key
+
+
+class Fence(NamedTuple):
+    """
+    Захваченная блокировка: ключ блокировки и её номер. Номера растут
+    монотонно, поэтому узел, чья аренда истекла, не перезапишет результат
+    следующего владельца
+    """
+
+    key: str
+    token: int
+
+
+class LockLostError(Exception):
+    """
+    Аренда истекла или перешла к другому узлу до записи результата
+    """
+
+
+class RedisLock:
+    """
+    Распределённая аренда пересчёта записи кэша: при промахе пересчитывает
+    только узел, захвативший блокировку, остальные ждут результата.
+    Аренда ограничена timeout секундами, чтобы упавший узел не держал её вечно.
+    """
+
+    def __init__(self, client: RedisClient, timeout: float):
+        self._client = client
+        self.timeout = timeout
+
+    async def acquire(self, key: str) -> Fence | None:
+        """
+        Захватить блокировку пересчёта ключа key, None - если она занята
+        """
+        lock_key = prepare_lock_key(key)
+        token = await self._client.incr(prepare_lock_key('fence'))
+        px = max(int(self.timeout * 1000), 1)
+        if await self._client.set(lock_key, token, nx=True, px=px):
+            return Fence(lock_key, token)
+        return None
+
+    async def is_held(self, fence: Fence) -> bool:
+        return await self._client.get(fence.key) == str(fence.token).encode()
+
+    async def release(self, fence: Fence):
+        """
+        Снять блокировку, если она всё ещё наша
+        """
+        async with self._client.pipeline() as pipe:
+            try:
+                await pipe.watch(fence.key)
+                if await pipe.get(fence.key) != str(fence.token).encode():
+                    return
+                pipe.multi()
+                pipe.delete(fence.key)
+                await pipe.execute()
+            except WatchError:
+                # Блокировку успели перехватить, она уже не наша
+                pass
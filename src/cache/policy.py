@@ -0,0 +1,47 @@
+import math
+
+from core.config import CachePolicy, settings
+
+
+def get_policy(name: str) -> CachePolicy:
+    """
+    Политика кэширования метода name (<Класс>.<метод>) с подставленными
+    значениями по умолчанию
+    """
+    defaults = CachePolicy(
+        enabled=True,
+        expiration_in_seconds=settings.cache_expiration_in_seconds,
+        negative_expiration_in_seconds=settings.cache_negative_expiration_in_seconds,
+        max_payload_in_bytes=settings.cache_max_payload_in_bytes,
+        tier='remote',
+        adaptive_ttl=settings.cache_adaptive_ttl,
+    )
+    policy = settings.cache_policies.get(name)
+    if policy is None:
+        return defaults
+    return defaults.copy(update=policy.dict(exclude_none=True))
+
+
+def tag_expiration() -> int:
+    """
+    Время жизни множеств ключей по тегам: не меньше
+    cache_tag_expiration_in_seconds и самой долгой записи с учётом случайной
+    добавки, адаптивного продления и stale_while_revalidate. Иначе множество
+    истечёт раньше записей и сброс по тегу их пропустит
+    """
+    longest = settings.cache_entity_expiration_in_seconds
+    for name in ('', *settings.cache_policies):
+        policy = get_policy(name)
+        ttl = max(
+            policy.expiration_in_seconds or 0,
+            policy.negative_expiration_in_seconds or 0,
+        )
+        if policy.adaptive_ttl:
+            ttl *= max(settings.cache_adaptive_hot_factor, 1)
+        longest = max(longest, ttl)
+
+    longest = (
+        longest * (1 + settings.cache_expiration_jitter)
+        + settings.cache_stale_while_revalidate_in_seconds
+    )
+    return max(settings.cache_tag_expiration_in_seconds, math.ceil(longest))
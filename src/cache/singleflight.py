@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Callable
+
+
+class SingleFlight:
+    """
+    Объединение одновременных одинаковых вызовов: пока вызов по ключу не
+    завершился, остальные вызывающие ждут его результат, а не повторяют его.
+    """
+
+    def __init__(self):
+        self._calls: dict[str, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def start(self, key: str, func: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        """
+        Запустить вызов по ключу, если он ещё не выполняется, не дожидаясь его
+        """
+        call = self._calls.get(key)
+        if call is None:
+            call = asyncio.ensure_future(func())
+            self._calls[key] = call
+            call.add_done_callback(lambda done: self._forget(key, done))
+        return call
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        # Отмена одного из ожидающих не должна отменять общий вызов
+        return await asyncio.shield(self.start(key, func))
+
+    def _forget(self, key: str, call: asyncio.Future):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        if not call.cancelled():
+            # Помечаем исключение прочитанным, даже если ждать было некому
+            call.exception()
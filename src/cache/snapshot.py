@@ -0,0 +1,103 @@
+"""
+Формат снимка локального кэша, который воркер сохраняет при выключении и
+загружает при старте.
+
+Заголовок: сигнатура, версия, время создания и число записей, затем записи
+подряд: длины ключа и значения, время вытеснения из L1 и время истечения
+(NaN - без срока, время по часам time.time), ключ в UTF-8 и значение.
+Файл читается через mmap без промежуточного буфера.
+"""
+from __future__ import annotations
+
+import math
+import mmap
+import os
+import struct
+import tempfile
+from typing import Iterable, NamedTuple
+
+MAGIC = b'MVXL1'
+VERSION = 1
+HEADER = struct.Struct('<5sBdI')
+RECORD = struct.Struct('<HIdd')
+
+
+class SnapshotError(Exception):
+    ...
+
+
+class SnapshotRecord(NamedTuple):
+    key: str
+    evict_at: float
+    expires_at: float | None
+    value: bytes
+
+
+def write_snapshot(path: str, created_at: float, records: Iterable[SnapshotRecord]):
+    """
+    Записать снимок атомарно: несколько воркеров могут сохранять его
+    одновременно, остаётся последний
+    """
+    records = list(records)
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.snapshot-')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(HEADER.pack(MAGIC, VERSION, created_at, len(records)))
+            for record in records:
+                key = record.key.encode()
+                expires_at = (
+                    math.nan if record.expires_at is None else record.expires_at
+                )
+                file.write(
+                    RECORD.pack(
+                        len(key), len(record.value), record.evict_at, expires_at
+                    )
+                )
+                file.write(key)
+                file.write(record.value)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def read_snapshot(path: str) -> tuple[float, list[SnapshotRecord]]:
+    """
+    Время создания снимка и его записи в порядке сохранения
+    """
+    with open(path, 'rb') as file:
+        try:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError as e:
+            raise SnapshotError(f"Empty snapshot {path}") from e
+
+    with data:
+        try:
+            return _parse(data)
+        except (struct.error, UnicodeDecodeError) as e:
+            raise SnapshotError(f"Broken snapshot {path}") from e
+
+
+def _parse(data: mmap.mmap) -> tuple[float, list[SnapshotRecord]]:
+    magic, version, created_at, count = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise SnapshotError("Unknown snapshot format")
+
+    records = []
+    offset = HEADER.size
+    for _ in range(count):
+        key_size, value_size, evict_at, expires_at = RECORD.unpack_from(data, offset)
+        offset += RECORD.size
+        key = data[offset : offset + key_size].decode()
+        offset += key_size
+        value = data[offset : offset + value_size]
+        offset += value_size
+        if len(value) != value_size:
+            raise SnapshotError("Truncated snapshot")
+        records.append(
+            SnapshotRecord(
+                key, evict_at, None if math.isnan(expires_at) else expires_at, value
+            )
+        )
+    return created_at, records
@@ -0,0 +1,45 @@
+from dataclasses import asdict, dataclass
+from typing import Any
+
+
+@dataclass
+class CacheStats:
+    """
+    Счётчики обращений к локальному кэшу
+    """
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+    def as_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass
+class CompressionStats:
+    """
+    Счётчики сжатия значений кэша. Время в секундах
+    """
+
+    compressed: int = 0
+    raw_bytes: int = 0
+    compressed_bytes: int = 0
+    # Попытки сжатия, после которых значение не стало меньше
+    discarded: int = 0
+    compress_time: float = 0.0
+    decompressed: int = 0
+    decompress_time: float = 0.0
+
+    @property
+    def ratio(self) -> float | None:
+        """
+        Во сколько раз в среднем уменьшаются сжатые значения
+        """
+        if not self.compressed_bytes:
+            return None
+        return self.raw_bytes / self.compressed_bytes
+
+    def as_dict(self) -> dict[str, Any]:
+        return {**asdict(self), 'ratio': self.ratio}
@@ -1,7 +1,9 @@
 import os
+import tempfile
 from logging import config as logging_config
+from typing import Literal
 
-from pydantic import BaseSettings, SecretStr
+from pydantic import BaseModel, BaseSettings, SecretStr
 
 from core.logger import LOG_LEVEL, get_logging_config
 
@@ -10,6 +12,20 @@ class ModelConfig:
     allow_population_by_field_name = True
 
 
+class CachePolicy(BaseModel):
+    """
+    Политика кэширования метода. Незаданные поля берутся из общих настроек
+    cache_*, tier: local - L1 воркера перед Redis, remote - только Redis
+    """
+
+    enabled: bool = True
+    expiration_in_seconds: int | None = None
+    negative_expiration_in_seconds: int | None = None
+    max_payload_in_bytes: int | None = None
+    tier: Literal['local', 'remote'] | None = None
+    adaptive_ttl: bool | None = None
+
+
 class Settings(BaseSettings):
     # Название проекта. Используется в Swagger-документации
     project_name: str = 'movix-api'
@@ -17,10 +33,111 @@ class Settings(BaseSettings):
     # Настройки Redis
     redis_host: str = 'redis'
     redis_port: int = 6379
+    # Пространство имён ключей кэша в Redis
+    cache_key_prefix: str = 'movix'
     cache_expiration_in_seconds: int = 300
+    # Время жизни пустых результатов (не найден фильм, персона без фильмов)
+    cache_negative_expiration_in_seconds: int = 60
+    # Доля случайной добавки к времени жизни записей кэша
+    cache_expiration_jitter: float = 0.1
+    # Кодек значений кэша по умолчанию (pickle, orjson). pickle быстрее читает
+    # страницы моделей, orjson компактнее и безопаснее, см. benchmarks.cache_codecs
+    cache_codec: str = 'pickle'
+    # Читать ли из кэша записи в pickle. Отключается, если в Redis может
+    # писать кто-то кроме сервиса, вместе с cache_codec=orjson
+    cache_allow_pickle: bool = True
+    # Значения не меньше этого размера сжимаются zlib (0 - не сжимать)
+    cache_compression_threshold_bytes: int = 2048
+    cache_compression_level: int = 1
+    # Время жизни общих записей сущностей нормализованных списков, должно быть
+    # больше времени жизни списков, иначе они будут пересчитываться раньше
+    cache_entity_expiration_in_seconds: int = 900
+    # Время жизни множеств ключей по тегам. Увеличивается до самой долгой
+    # записи по политикам, см. cache.policy.tag_expiration
+    cache_tag_expiration_in_seconds: int = 3600
+    # Сколько после истечения отдавать устаревшее значение, обновляя его в фоне
+    cache_stale_while_revalidate_in_seconds: int = 60
+
+    # Блокировка пересчёта между узлами (cache_decorator(distributed_lock=True)):
+    # срок аренды, сколько остальные ждут результата и как часто его проверяют
+    cache_lock_timeout_in_seconds: float = 10
+    cache_lock_wait_in_seconds: float = 2
+    cache_lock_poll_interval_in_seconds: float = 0.05
+
+    # Локальный кэш воркера (L1) перед Redis
+    cache_local_max_size: int = 1024
+    cache_local_expiration_in_seconds: int = 30
+    # Снимок L1, который воркер сохраняет при выключении и загружает при старте
+    # ('' - не сохранять). Записи старше max_age не загружаются
+    cache_snapshot_path: str = os.path.join(
+        tempfile.gettempdir(), 'movix-api-cache.snapshot'
+    )
+    cache_snapshot_max_entries: int = 1024
+    cache_snapshot_max_age_in_seconds: int = 300
+    # Рассылать изменённые ключи через Redis pub/sub, чтобы остальные воркеры
+    # удаляли их из L1. Позволяет держать записи в L1 дольше
+    cache_invalidation_enabled: bool = True
+    # Записи больше этого размера в байтах (после сжатия) не кэшируются, 0 - без
+    # ограничения. Для нормализованных списков (entity) считается суммарный
+    # размер их сущностей
+    cache_max_payload_in_bytes: int = 0
+    # Политики кэширования методов хранилищ (<Класс>.<метод>), например
+    # CACHE_POLICIES='{"FilmElasticStorage.get_by_query": {"expiration_in_seconds": 60}}'
+    # Значение из окружения заменяет политики по умолчанию целиком
+    cache_policies: dict[str, CachePolicy] = {
+        'GenreElasticStorage.get_item': CachePolicy(
+            expiration_in_seconds=3600, tier='local'
+        ),
+        'GenreElasticStorage.get_items': CachePolicy(
+            expiration_in_seconds=3600, tier='local'
+        ),
+        'GenreElasticStorage.get_genre_popularity': CachePolicy(
+            expiration_in_seconds=3600, tier='local'
+        ),
+        # Таблица популярности делится воркерами через Redis и живёт
+        # период её пересчёта
+        'GenreElasticStorage.get_genres_popularity': CachePolicy(
+            expiration_in_seconds=300
+        ),
+        'FilmElasticStorage.get_by_query': CachePolicy(
+            expiration_in_seconds=60, max_payload_in_bytes=16384, adaptive_ttl=True
+        ),
+        'PersonElasticStorage.get_items': CachePolicy(
+            expiration_in_seconds=60, max_payload_in_bytes=16384, adaptive_ttl=True
+        ),
+    }
+    # Время жизни по частоте обращений (adaptive_ttl политики): частоты
+    # считаются count-min sketch ширины width и глубины depth, который
+    # стареет каждые width * sample_factor обращений. Ключи с частотой не
+    # меньше hot_threshold живут в hot_factor раз дольше, с одним обращением -
+    # в cold_factor раз меньше, реже admission_threshold не кэшируются
+    cache_adaptive_ttl: bool = False
+    cache_adaptive_sketch_width: int = 4096
+    cache_adaptive_sketch_depth: int = 4
+    cache_adaptive_sample_factor: int = 10
+    cache_adaptive_hot_threshold: int = 8
+    cache_adaptive_hot_factor: float = 4
+    cache_adaptive_cold_factor: float = 0.25
+    cache_adaptive_admission_threshold: int = 1
+
+    # Прогрев кэша при старте воркера: список жанров, жанры с популярностью
+    # и первые страницы списков фильмов с указанными сортировками
+    cache_warmup_enabled: bool = True
+    cache_warmup_pages: int = 3
+    cache_warmup_page_size: int = 50
+    cache_warmup_sorts: list[str] = ['id:asc', '-imdb_rating']
+    # Период повторного прогрева (0 - только при старте)
+    cache_warmup_interval_in_seconds: int = 0
+
+    # Период пересчёта таблицы популярности жанров, которую держит каждый
+    # воркер (0 - популярность считается отдельно для каждого жанра)
+    genre_popularity_refresh_interval_in_seconds: int = 300
 
     # Настройки Elasticsearch
     elastic_endpoint: str = 'http://elastic:9200'
+    # Чтения документов по id за это время объединяются в один mget
+    # (0 - в пределах одного тика цикла событий)
+    elastic_batch_window_in_seconds: float = 0
 
     # Корень проекта
     base_dir = os.path.dirname(os.path.dirname(__file__))
@@ -31,6 +148,8 @@ class Settings(BaseSettings):
     access_token_audience: str = 'movix:auth'
 
     auth_user_rights_endpoint: str = 'http://auth:8000/api/v1/users/user_id/roles'
+    # Право, необходимое для служебных ручек (сброс кэша)
+    admin_right: str = 'admin'
 
     sentry_dsn_api: str = ""
 
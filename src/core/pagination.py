@@ -1,4 +1,19 @@
-from fastapi import Query
+import base64
+import binascii
+from http import HTTPStatus
+from typing import Annotated, Any, Sequence
+
+import orjson
+from fastapi import HTTPException, Query
+from pydantic import BaseModel
+
+from core.sorting import sort_fields
+
+# Значение search_after для документов без поля сортировки: elasticsearch
+# ставит их в конец, т.е. считает +inf при asc и -inf при desc
+MISSING_SORT_VALUES = {'asc': 'Infinity', 'desc': '-Infinity'}
+
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
 
 
 class PaginateQueryParams:
@@ -16,6 +31,98 @@ class PaginateQueryParams:
             ge=1,
             le=500,
         ),
+        cursor: Annotated[
+            str | None,
+            Query(
+                title="Page cursor.",
+                description="Cursor from X-Next-Cursor header of the previous "
+                "page, page_number is ignored when set",
+            ),
+        ] = None,
     ):
         self.page_number = page_number
         self.page_size = page_size
+        self.cursor = cursor
+        self.search_after = decode_cursor(cursor) if cursor else None
+
+    def __cache_key__(self) -> tuple[int | str, ...]:
+        if self.cursor:
+            return self.page_size, self.cursor
+        return self.page_number, self.page_size
+
+    def without_cursor(self) -> 'PaginateQueryParams':
+        return PaginateQueryParams(self.page_number, self.page_size)
+
+    def check_cursor(self, sort: str | None, model: type[BaseModel]):
+        """
+        Проверить, что курсор подходит к сортировке sort по полям model:
+        search_after с другим числом или типом значений elasticsearch
+        отклоняет с 400, а клиенту это должно приходить как 422
+        """
+        if self.search_after is None:
+            return
+        fields = sort_fields(sort)
+        if len(self.search_after) != len(fields) or not all(
+            is_sort_value(model, field, value)
+            for (field, _), value in zip(fields, self.search_after)
+        ):
+            raise invalid_cursor()
+
+
+def encode_cursor(search_after: Sequence[Any]) -> str:
+    return base64.urlsafe_b64encode(orjson.dumps(search_after)).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> list[Any]:
+    try:
+        search_after = orjson.loads(
+            base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        )
+    except (binascii.Error, ValueError):
+        search_after = None
+    if not isinstance(search_after, list) or not search_after:
+        raise invalid_cursor()
+    return search_after
+
+
+def invalid_cursor() -> HTTPException:
+    return HTTPException(
+        status_code=HTTPStatus.UNPROCESSABLE_ENTITY, detail="invalid cursor"
+    )
+
+
+def is_sort_value(model: type[BaseModel], field: str, value: Any) -> bool:
+    """
+    Может ли value быть значением поля сортировки field в курсоре для model
+    """
+    model_field = model.__fields__.get(field)
+    if model_field is None:
+        return False
+    field_type = model_field.type_
+    if isinstance(field_type, type) and issubclass(field_type, (int, float)):
+        if isinstance(value, str):
+            return value in MISSING_SORT_VALUES.values()
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+    return isinstance(value, str)
+
+
+def next_cursor(
+    items: Sequence[Any] | None,
+    sort: str | None,
+    pagination: PaginateQueryParams | None,
+) -> str | None:
+    """
+    Курсор следующей страницы: значения полей сортировки последнего элемента.
+    None, если страница последняя или поле сортировки не входит в модель
+    """
+    if not items or pagination is None or len(items) < pagination.page_size:
+        return None
+
+    last = items[-1]
+    search_after = []
+    for field, order in sort_fields(sort):
+        if field not in last.__fields__:
+            return None
+        value = getattr(last, field)
+        search_after.append(MISSING_SORT_VALUES[order] if value is None else value)
+    return encode_cursor(search_after)
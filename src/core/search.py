@@ -0,0 +1,10 @@
+import unicodedata
+
+
+def normalize_query(query: str) -> str:
+    """
+    Привести поисковый запрос к единому виду: NFKC, без учёта регистра,
+    пробелы схлопнуты. "Star Wars", "star wars " и "STAR  WARS" дают один
+    запрос и один ключ кэша
+    """
+    return ' '.join(unicodedata.normalize('NFKC', query).casefold().split())
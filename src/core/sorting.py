@@ -0,0 +1,33 @@
+DEFAULT_SORT = 'id:asc'
+
+
+def parse_sort(sort: str | None) -> str:
+    """
+    Привести параметр сортировки вида +field/-field к виду field:asc/field:desc
+    """
+    if not sort:
+        return DEFAULT_SORT
+
+    match sort[0]:
+        case "+":
+            return f"{sort[1:]}:asc"
+        case "-":
+            return f"{sort[1:]}:desc"
+        case _:
+            return DEFAULT_SORT
+
+
+def sort_fields(sort: str | None) -> list[tuple[str, str]]:
+    """
+    Поля и направления сортировки. Последним всегда идёт id, чтобы порядок
+    был однозначным и по нему можно было продолжить выдачу через search_after
+    """
+    field, order = parse_sort(sort).rsplit(':', 1)
+    fields = [(field, order)]
+    if field != 'id':
+        fields.append(('id', 'asc'))
+    return fields
+
+
+def sort_clause(sort: str | None) -> list[str]:
+    return [f'{field}:{order}' for field, order in sort_fields(sort)]
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
-from typing import Any, cast
+from typing import Any, Iterable, cast
 
 from elastic_transport import ObjectApiResponse
 
@@ -42,6 +42,33 @@ class ElasticManagerABC(DBManager):
     async def search(self, *args, **kwargs) -> ObjectApiResponse[Any]:
         ...
 
+    @abstractmethod
+    async def msearch(self, *args, **kwargs) -> ObjectApiResponse[Any]:
+        ...
+
+    @abstractmethod
+    async def mget(self, *args, **kwargs) -> ObjectApiResponse[Any]:
+        ...
+
+    @abstractmethod
+    async def get_source(
+        self, index: str, doc_id: Any, source: Iterable[str] | None = None
+    ) -> dict[str, Any] | None:
+        """
+        _source документа или None, если его нет. Одновременные вызовы
+        объединяются в один mget
+        """
+        ...
+
+    @abstractmethod
+    async def get_sources(
+        self, index: str, doc_ids: Iterable[Any], source: Iterable[str] | None = None
+    ) -> list[dict[str, Any] | None]:
+        """
+        _source документов в порядке doc_ids, None - для ненайденных
+        """
+        ...
+
     @classmethod
     def get_instance(cls) -> ElasticManagerABC | None:
         instance = super().get_instance()
@@ -1,8 +1,15 @@
+from functools import partial
+from typing import Any, Iterable
+
 from elasticsearch import AsyncElasticsearch
 
 from core.config import settings
 
 from .abc import DBClient, ElasticManagerABC
+from .loader import ElasticBatchLoader
+
+# Части ответа mget, которые читает загрузчик
+MGET_FILTER_PATH = 'docs._id,docs.found,docs._source,docs.error'
 
 
 class ElasticClient(AsyncElasticsearch, DBClient):
@@ -19,6 +26,10 @@ class ElasticManager(ElasticManagerABC):
     def __init__(self, client: ElasticClient):
         super().__init__(client)
         self._client: ElasticClient
+        self._loader = ElasticBatchLoader(
+            partial(self.mget, filter_path=MGET_FILTER_PATH),
+            settings.elastic_batch_window_in_seconds,
+        )
 
     def get_client(self) -> ElasticClient:
         return self._client
@@ -32,6 +43,22 @@ class ElasticManager(ElasticManagerABC):
     async def search(self, *args, **kwargs):
         return await self.get_client().search(*args, **kwargs)
 
+    async def msearch(self, *args, **kwargs):
+        return await self.get_client().msearch(*args, **kwargs)
+
+    async def mget(self, *args, **kwargs):
+        return await self.get_client().mget(*args, **kwargs)
+
+    async def get_source(
+        self, index: str, doc_id: Any, source: Iterable[str] | None = None
+    ) -> dict[str, Any] | None:
+        return await self._loader.load(index, doc_id, source)
+
+    async def get_sources(
+        self, index: str, doc_ids: Iterable[Any], source: Iterable[str] | None = None
+    ) -> list[dict[str, Any] | None]:
+        return await self._loader.load_many(index, doc_ids, source)
+
 
 def get_manager() -> ElasticManagerABC:
     """
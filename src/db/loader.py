@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Iterable
+
+# Ключ пачки: индекс и поля _source (None - документ целиком)
+BatchKey = tuple[str, tuple[str, ...] | None]
+
+
+class DocumentError(Exception):
+    """
+    mget не смог прочитать документ (например, шард недоступен). В отличие
+    от ненайденного документа это не результат, его нельзя кэшировать
+    """
+
+
+class ElasticBatchLoader:
+    """
+    Объединяет чтения документов по id, сделанные в пределах одного тика
+    цикла событий (или window секунд), в один mget на индекс. Каждый
+    вызывающий получает свой документ, одинаковые id запрашиваются один раз.
+    """
+
+    def __init__(self, mget: Callable[..., Awaitable[Any]], window: float = 0):
+        self._mget = mget
+        self.window = window
+        self._pending: dict[BatchKey, dict[str, list[asyncio.Future]]] = {}
+        self._flush_handle: asyncio.Handle | None = None
+        # Ссылки на запущенные mget, чтобы задачи не собрал сборщик мусора
+        self._requests: set[asyncio.Task] = set()
+
+    def load(
+        self, index: str, doc_id: Any, source: Iterable[str] | None = None
+    ) -> asyncio.Future:
+        """
+        Будущий _source документа doc_id из index или None, если его нет.
+        Если mget не смог прочитать документ, будущее завершится DocumentError
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch_key = (index, tuple(source) if source is not None else None)
+        batch = self._pending.setdefault(batch_key, {})
+        batch.setdefault(str(doc_id), []).append(future)
+
+        if self._flush_handle is None:
+            if self.window:
+                self._flush_handle = loop.call_later(self.window, self._flush)
+            else:
+                self._flush_handle = loop.call_soon(self._flush)
+        return future
+
+    async def load_many(
+        self, index: str, doc_ids: Iterable[Any], source: Iterable[str] | None = None
+    ) -> list[dict | None]:
+        source = tuple(source) if source is not None else None
+        return await asyncio.gather(
+            *(self.load(index, doc_id, source) for doc_id in doc_ids)
+        )
+
+    def _flush(self):
+        pending, self._pending, self._flush_handle = self._pending, {}, None
+        for batch_key, batch in pending.items():
+            request = asyncio.ensure_future(self._fetch(batch_key, batch))
+            self._requests.add(request)
+            request.add_done_callback(self._requests.discard)
+
+    async def _fetch(self, batch_key: BatchKey, batch: dict[str, list[asyncio.Future]]):
+        index, source = batch_key
+        kwargs: dict[str, Any] = {'index': index, 'ids': list(batch)}
+        if source is not None:
+            kwargs['source'] = list(source)
+
+        try:
+            response = await self._mget(**kwargs)
+        except Exception as e:
+            for futures in batch.values():
+                _resolve(futures, exception=e)
+            return
+
+        for doc in response['docs']:
+            if 'error' in doc:
+                logging.error(
+                    "Failed to get %s/%s: %s", index, doc['_id'], doc['error']
+                )
+                _resolve(
+                    batch.get(doc['_id'], []),
+                    exception=DocumentError(f"{index}/{doc['_id']}: {doc['error']}"),
+                )
+                continue
+            # С filter_path пустой _source (нет ни одного из полей) не приходит
+            found = doc.get('found', False)
+            _resolve(
+                batch.get(doc['_id'], []), doc.get('_source', {}) if found else None
+            )
+        for futures in batch.values():
+            # Документы, которых не оказалось в ответе
+            _resolve(futures, None)
+
+
+def _resolve(
+    futures: list[asyncio.Future],
+    result: Any = None,
+    exception: BaseException | None = None,
+):
+    for future in futures:
+        if future.done():
+            # Вызывающий отменил ожидание или результат уже выставлен
+            continue
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
@@ -1,4 +1,7 @@
-from typing import Optional
+import asyncio
+import logging
+from contextlib import suppress
+from typing import Awaitable, Callable, Optional
 
 from redis.asyncio import Redis
 
@@ -8,6 +11,13 @@ from .abc import DBClient, DBManager
 
 redis: Optional[Redis] = None
 
+# Обработчик сообщения канала и обработчик (пере)подписки на канал
+MessageHandler = Callable[[bytes], Awaitable[None]]
+SubscribeHandler = Callable[[], Awaitable[None]]
+
+# Пауза перед повторной подпиской после ошибки соединения
+RESUBSCRIBE_DELAY_IN_SECONDS = 1
+
 
 class RedisClient(Redis, DBClient):
     """
@@ -25,12 +35,60 @@ class RedisManager(DBManager):
     def __init__(self, client: RedisClient):
         super().__init__(client)
         self._client: RedisClient
+        self._handlers: dict[str, tuple[MessageHandler, SubscribeHandler | None]] = {}
+        self._listener: asyncio.Task | None = None
 
     def get_client(self) -> RedisClient:
         return self._client
 
+    def subscribe(
+        self,
+        channel: str,
+        on_message: MessageHandler,
+        on_subscribe: SubscribeHandler | None = None,
+    ):
+        """
+        Подписаться на канал pub/sub. Слушатель запускается в on_startup.
+        on_subscribe вызывается при каждой (пере)подписке: сообщения, отправленные
+        пока соединения не было, потеряны
+        """
+        self._handlers[channel] = (on_message, on_subscribe)
+
     async def on_startup(self):
         await self._client.ping()
+        if self._handlers and self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def on_shutdown(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._listener
+            self._listener = None
+        await super().on_shutdown()
+
+    async def _listen(self):
+        while True:
+            try:
+                async with self._client.pubsub() as pubsub:
+                    await pubsub.subscribe(*self._handlers)
+                    async for message in pubsub.listen():
+                        await self._dispatch(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error("Redis subscription failed: %s", e)
+            await asyncio.sleep(RESUBSCRIBE_DELAY_IN_SECONDS)
+
+    async def _dispatch(self, message: dict):
+        channel = message['channel']
+        if isinstance(channel, bytes):
+            channel = channel.decode()
+        on_message, on_subscribe = self._handlers[channel]
+        if message['type'] == 'message':
+            await on_message(message['data'])
+        elif message['type'] == 'subscribe' and on_subscribe is not None:
+            await on_subscribe()
 
 
 def get_manager() -> RedisManager:
@@ -1,10 +1,17 @@
+import asyncio
+from http import HTTPStatus
+
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.responses import ORJSONResponse
 
-from api.v1 import films, genres, persons, users
+from api.v1 import cache, films, genres, persons, users
+from cache.cache import get_cache
 from core.config import settings
 from db import elastic, redis
+from services.concurrency import ServiceUnavailableError
+from services.genres import get_genres_service
+from services.warmup import get_cache_warmer
 
 app = FastAPI(
     title=settings.project_name,
@@ -14,16 +21,56 @@ app = FastAPI(
 )
 
 
+@app.exception_handler(ServiceUnavailableError)
+async def service_unavailable_handler(request: Request, exc: ServiceUnavailableError):
+    return ORJSONResponse(
+        status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+        content={'detail': 'storage unavailable'},
+    )
+
+
 @app.on_event("startup")
 async def startup():
+    if settings.cache_snapshot_path:
+        get_cache().load_snapshot(
+            settings.cache_snapshot_path, settings.cache_snapshot_max_age_in_seconds
+        )
     redis_manager = redis.get_manager()
     await redis_manager.on_startup()
     elastic_manager = elastic.get_manager()
     await elastic_manager.on_startup()
+    popularity_ready = asyncio.Event()
+    if settings.genre_popularity_refresh_interval_in_seconds:
+        genre_service = get_genres_service()
+        app.state.genre_popularity = asyncio.create_task(
+            genre_service.refresh_popularity_periodically(
+                settings.genre_popularity_refresh_interval_in_seconds, popularity_ready
+            )
+        )
+    else:
+        popularity_ready.set()
+    if settings.cache_warmup_enabled:
+        # Прогреваем в фоне, чтобы не задерживать старт воркера
+        app.state.cache_warmup = asyncio.create_task(warm_up(popularity_ready))
+
+
+async def warm_up(popularity_ready: asyncio.Event):
+    # Прогрев ждёт первого пересчёта таблицы популярности жанров, иначе он
+    # посчитает популярность каждого жанра отдельной агрегацией
+    await popularity_ready.wait()
+    await get_cache_warmer().run_periodically(settings.cache_warmup_interval_in_seconds)
 
 
 @app.on_event("shutdown")
 async def shutdown():
+    for name in ('cache_warmup', 'genre_popularity'):
+        task = getattr(app.state, name, None)
+        if task is not None:
+            task.cancel()
+    if settings.cache_snapshot_path:
+        get_cache().save_snapshot(
+            settings.cache_snapshot_path, settings.cache_snapshot_max_entries
+        )
     # Отключаемся от баз при выключении сервера
     redis_manager = redis.get_manager()
     await redis_manager.on_shutdown()
@@ -35,6 +82,7 @@ app.include_router(films.router, prefix="/api/v1/films", tags=["Фильмы"])
 app.include_router(genres.router, prefix="/api/v1/genres", tags=["Жанры"])
 app.include_router(persons.router, prefix="/api/v1/persons", tags=["Персоны"])
 app.include_router(users.router, prefix="/api/v1/users", tags=["Пользователи"])
+app.include_router(cache.router, prefix="/api/v1/cache", tags=["Кэш"])
 
 if __name__ == "__main__":
     uvicorn.run(
@@ -1,3 +1,5 @@
+from pydantic import BaseModel
+
 from models.mixins import UUIDMixin
 
 
@@ -19,6 +21,11 @@ class Genre(GenreShort):
     description: str | None = None
 
 
+class GenrePopularity(UUIDMixin):
+    popularity: float | None = None
+    films_count: int = 0
+
+
 class Film(FilmShort):
     description: str | None = None
     genres: list[GenreShort] | None = None
@@ -38,3 +45,12 @@ class Person(PersonShort):
 class User(UUIDMixin):
     access_rights: list[str] | None = None
     auth_timeout: bool = False
+
+
+class CacheInvalidation(BaseModel):
+    tags: list[str]
+    removed: int
+
+
+class CacheCleanup(BaseModel):
+    removed: int
@@ -32,6 +32,12 @@ class FilmServiceABC(ABC):
     ) -> list[models.FilmRoles]:
         ...
 
+    @abstractmethod
+    async def get_films_with_roles_by_persons(
+        self, person_ids: list[UUID], pagination: PaginateQueryParams | None
+    ) -> list[list[models.FilmRoles] | None]:
+        ...
+
     @abstractmethod
     async def get_films_by_person(
         self, person_id: UUID, pagination: PaginateQueryParams | None
@@ -48,6 +54,10 @@ class GenreServiceABC(ABC):
     async def get_genres(self) -> list[models.Genre] | None:
         ...
 
+    @abstractmethod
+    async def refresh_popularity(self):
+        ...
+
 
 class PersonServiceABC(ABC):
     @abstractmethod
@@ -0,0 +1,39 @@
+import asyncio
+from typing import Any, Coroutine
+
+import redis.exceptions
+from elasticsearch import ConnectionError as ElasticConnectionError
+from elasticsearch import ConnectionTimeout as ElasticConnectionTimeout
+
+# Ошибки, означающие, что хранилище недоступно, а не что данных нет
+UNAVAILABLE_ERRORS = (
+    ElasticConnectionError,
+    ElasticConnectionTimeout,
+    redis.exceptions.ConnectionError,
+    redis.exceptions.TimeoutError,
+)
+
+
+class ServiceUnavailableError(Exception):
+    """
+    Хранилище не ответило на один из запросов
+    """
+
+
+async def gather(*coros: Coroutine[Any, Any, Any]) -> list[Any]:
+    """
+    Выполнить независимые запросы параллельно и вернуть результаты в том же
+    порядке. Если один из запросов упал, остальные отменяются, а наружу
+    выходит его исключение (без ExceptionGroup); недоступность хранилища
+    превращается в ServiceUnavailableError
+    """
+    try:
+        async with asyncio.TaskGroup() as group:
+            tasks = [group.create_task(coro) for coro in coros]
+    except BaseExceptionGroup as errors:
+        error = errors.exceptions[0]
+        if isinstance(error, UNAVAILABLE_ERRORS):
+            raise ServiceUnavailableError(str(error)) from error
+        raise error from None
+
+    return [task.result() for task in tasks]
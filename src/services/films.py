@@ -1,6 +1,7 @@
 from functools import lru_cache
 from uuid import UUID
 
+from core.search import normalize_query
 from db.elastic import get_manager as get_elastic_manager
 from models.models import Film, FilmRoles
 from storages.abc import FilmStorageABC
@@ -40,7 +41,9 @@ class FilmService(FilmServiceABC):
         return [Film(**f.dict()) for f in films]
 
     async def get_by_query(self, query, pagination) -> list[Film] | None:
-        films = await self.storage.get_by_query(query, None, pagination)
+        films = await self.storage.get_by_query(
+            normalize_query(query), None, pagination
+        )
 
         if not films:
             return None
@@ -64,6 +67,14 @@ class FilmService(FilmServiceABC):
             None, pagination, person_id
         )
 
+    async def get_films_with_roles_by_persons(
+        self, person_ids: list[UUID], pagination
+    ) -> list[list[FilmRoles] | None]:
+        """Получить фильмы с ролями сразу для нескольких персон"""
+        return await self.storage.get_films_with_roles_by_persons(
+            None, pagination, person_ids
+        )
+
 
 @lru_cache
 def get_film_service() -> FilmService:
@@ -1,33 +1,68 @@
+import asyncio
+import logging
 from functools import lru_cache
 from uuid import UUID
 
 from db.elastic import get_manager as get_elastic_manager
-from models.models import Genre, GenreShort
+from models.models import Genre, GenrePopularity, GenreShort
 from storages.abc import GenreStorageABC
 from storages.storages import GenreElasticStorage
 
 from .abc import GenreServiceABC
+from .concurrency import gather
 
 
 class GenreService(GenreServiceABC):
     def __init__(self, storage: GenreStorageABC):
         self.storage = storage
+        # Популярность жанров по id, None - таблица ещё не загружена
+        self.popularity: dict[UUID, GenrePopularity] | None = None
 
     async def get_by_id(self, item_id: UUID) -> Genre | None:
         """Данные по конкретному жанру."""
-        genre = await self.storage.get_item(item_id)
+        if self.popularity is None:
+            genre, popularity = await gather(
+                self.storage.get_item(item_id),
+                self.storage.get_genre_popularity(item_id),
+            )
+        else:
+            genre = await self.storage.get_item(item_id)
+            # Жанра нет в таблице - у него нет фильмов
+            stats = self.popularity.get(item_id)
+            popularity = stats.popularity if stats else None
 
         if not genre:
             return None
 
-        popularity = await self.storage.get_genre_popularity(item_id)
-
         return Genre(**dict(genre), popularity=popularity)
 
     async def get_genres(self) -> list[GenreShort] | None:
         """Получить список жанров"""
         return await self.storage.get_items()
 
+    async def refresh_popularity(self):
+        """Пересчитать таблицу популярности жанров одной агрегацией"""
+        genres = await self.storage.get_genres_popularity()
+        if genres is None:
+            return
+        self.popularity = {genre.id: genre for genre in genres}
+
+    async def refresh_popularity_periodically(
+        self, interval: float, ready: asyncio.Event | None = None
+    ):
+        """
+        Пересчитывать таблицу каждые interval секунд. Если пересчёт упал,
+        остаётся прежняя таблица. ready выставляется после первой попытки
+        """
+        while True:
+            try:
+                await self.refresh_popularity()
+            except Exception as e:
+                logging.error("Genre popularity refresh failed: %s", e)
+            if ready is not None:
+                ready.set()
+            await asyncio.sleep(interval)
+
 
 @lru_cache
 def get_genres_service() -> GenreService:
@@ -2,6 +2,7 @@ from functools import lru_cache
 from uuid import UUID
 
 from core.pagination import PaginateQueryParams
+from core.search import normalize_query
 from db.elastic import get_manager as get_elastic_manager
 from models import models
 from storages.abc import PersonStorageABC
@@ -22,7 +23,9 @@ class PersonService(PersonServiceABC):
         self, name: str, pagination: PaginateQueryParams | None
     ) -> list[models.PersonShort]:
         """Поиск по персонам."""
-        persons = await self.storage.get_items({'name': name}, None, pagination)
+        persons = await self.storage.get_items(
+            {'name': normalize_query(name)}, None, pagination
+        )
         if not persons:
             persons = []
         return persons
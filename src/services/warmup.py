@@ -0,0 +1,173 @@
+"""
+Прогрев кэша: заранее заполняет кэш самыми популярными ответами, чтобы после
+выкладки первые запросы не уходили в Elasticsearch.
+
+Внутри сервиса прогрев идёт через методы сервисов при старте и по расписанию.
+Для свежего кластера есть CLI, который запрашивает ручки по списку URL или
+по записанному access log:
+
+    python -m services.warmup --base-url http://api:8000 urls.txt
+    python -m services.warmup --base-url http://api:8000 --access-log access.log
+"""
+import argparse
+import asyncio
+import logging
+import re
+import sys
+from collections import Counter
+from functools import lru_cache
+from typing import Iterable, TextIO
+
+import httpx
+
+from core.config import settings
+from core.pagination import PaginateQueryParams
+
+from .abc import FilmServiceABC, GenreServiceABC
+from .films import get_film_service
+from .genres import get_genres_service
+
+# Запрос в access log uvicorn/nginx: "GET /api/v1/films/?page_number=2 HTTP/1.1" 200
+ACCESS_LOG_REQUEST = re.compile(r'"GET (?P<path>\S+) HTTP/[\d.]+" (?P<status>\d{3})')
+
+
+class CacheWarmer:
+    """
+    Заполняет кэш списком жанров, жанрами с популярностью и первыми
+    страницами списков фильмов
+    """
+
+    def __init__(
+        self,
+        genre_service: GenreServiceABC,
+        film_service: FilmServiceABC,
+        pages: int,
+        page_size: int,
+        sorts: Iterable[str],
+    ):
+        self.genre_service = genre_service
+        self.film_service = film_service
+        self.pages = pages
+        self.page_size = page_size
+        self.sorts = list(sorts)
+
+    async def run(self):
+        genres = await self.genre_service.get_genres() or []
+        for genre in genres:
+            await self.genre_service.get_by_id(genre.id)
+
+        for sort in self.sorts:
+            for page_number in range(1, self.pages + 1):
+                pagination = PaginateQueryParams(
+                    page_number=page_number, page_size=self.page_size
+                )
+                await self.film_service.get_films(sort, pagination, None, None)
+
+        logging.info(
+            "Cache warmed up: %d genres, %d film pages",
+            len(genres),
+            self.pages * len(self.sorts),
+        )
+
+    async def run_periodically(self, interval: float):
+        """
+        Прогреть сразу, затем повторять каждые interval секунд (0 - только раз).
+        Ошибки прогрева не останавливают сервис
+        """
+        while True:
+            try:
+                await self.run()
+            except Exception as e:
+                logging.error("Cache warm-up failed: %s", e)
+            if not interval:
+                return
+            await asyncio.sleep(interval)
+
+
+@lru_cache
+def get_cache_warmer() -> CacheWarmer:
+    return CacheWarmer(
+        genre_service=get_genres_service(),
+        film_service=get_film_service(),
+        pages=settings.cache_warmup_pages,
+        page_size=settings.cache_warmup_page_size,
+        sorts=settings.cache_warmup_sorts,
+    )
+
+
+def read_urls(lines: Iterable[str]) -> list[str]:
+    """
+    URL из файла по одному в строке, пустые строки и # комментарии пропускаются
+    """
+    urls = (line.split('#', 1)[0].strip() for line in lines)
+    return [url for url in urls if url]
+
+
+def read_access_log(lines: Iterable[str], limit: int | None = None) -> list[str]:
+    """
+    Успешные GET-запросы из access log, от самых частых к редким
+    """
+    counter: Counter[str] = Counter()
+    for line in lines:
+        match = ACCESS_LOG_REQUEST.search(line)
+        if match and match['status'] == '200':
+            counter[match['path']] += 1
+    return [path for path, _ in counter.most_common(limit)]
+
+
+async def warm_up_urls(base_url: str, urls: Iterable[str], concurrency: int) -> int:
+    """
+    Запросить urls не более чем по concurrency одновременно,
+    вернуть число неуспешных ответов
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    failed = 0
+
+    async def fetch(client: httpx.AsyncClient, url: str):
+        nonlocal failed
+        async with semaphore:
+            try:
+                response = await client.get(url)
+            except httpx.HTTPError as e:
+                logging.error("Failed to warm up %s: %s", url, e)
+                failed += 1
+                return
+        if response.is_error:
+            logging.warning("Failed to warm up %s: %s", url, response.status_code)
+            failed += 1
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+        await asyncio.gather(*(fetch(client, url) for url in urls))
+    return failed
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Прогрев кэша movix-api")
+    parser.add_argument('--base-url', default='http://localhost:8000')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument(
+        '--access-log', action='store_true', help="файл - access log, а не список URL"
+    )
+    parser.add_argument(
+        '--limit', type=int, default=None, help="сколько самых частых URL из лога"
+    )
+    parser.add_argument('file', type=argparse.FileType('r'), nargs='?', default='-')
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    file: TextIO = args.file
+    with file:
+        if args.access_log:
+            urls = read_access_log(file, args.limit)
+        else:
+            urls = read_urls(file)
+
+    failed = asyncio.run(warm_up_urls(args.base_url, urls, args.concurrency))
+    print(f"Warmed up {len(urls) - failed} of {len(urls)} urls")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
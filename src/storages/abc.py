@@ -18,6 +18,13 @@ class StorageABC(ABC):
     async def get_item(self, item_id: UUID) -> BaseModel | None:
         ...
 
+    @abstractmethod
+    async def get_items_by_ids(self, item_ids: list[UUID]) -> list[BaseModel | None]:
+        """
+        Модели в порядке item_ids, None - для ненайденных
+        """
+        ...
+
     @abstractmethod
     async def get_items(
         self,
@@ -33,6 +40,12 @@ class FilmStorageABC(StorageABC):
     async def get_item(self, item_id: UUID) -> models.Film | None:
         ...
 
+    @abstractmethod
+    async def get_items_by_ids(
+        self, item_ids: list[UUID]
+    ) -> list[models.FilmShort | None]:
+        ...
+
     @abstractmethod
     async def get_items(
         self,
@@ -84,16 +97,41 @@ class FilmStorageABC(StorageABC):
     ) -> list[models.FilmRoles] | None:
         ...
 
+    @abstractmethod
+    async def get_films_with_roles_by_persons(
+        self,
+        sort_order: str | None,
+        pagination: PaginateQueryParams | None,
+        person_ids: list[UUID],
+    ) -> list[list[models.FilmRoles] | None]:
+        """
+        Фильмы с ролями для каждой персоны из person_ids, в том же порядке
+        """
+        ...
+
 
 class GenreStorageABC(StorageABC):
     @abstractmethod
     async def get_item(self, item_id: UUID) -> models.GenreShort | None:
         ...
 
+    @abstractmethod
+    async def get_items_by_ids(
+        self, item_ids: list[UUID]
+    ) -> list[models.GenreShort | None]:
+        ...
+
     @abstractmethod
     async def get_genre_popularity(self, genre_id: UUID) -> float | None:
         ...
 
+    @abstractmethod
+    async def get_genres_popularity(self) -> list[models.GenrePopularity] | None:
+        """
+        Популярность и число фильмов всех жанров, у которых есть фильмы
+        """
+        ...
+
     @abstractmethod
     async def get_items(
         self,
@@ -109,6 +147,12 @@ class PersonStorageABC(StorageABC):
     async def get_item(self, item_id: UUID) -> models.PersonShort | None:
         ...
 
+    @abstractmethod
+    async def get_items_by_ids(
+        self, item_ids: list[UUID]
+    ) -> list[models.PersonShort | None]:
+        ...
+
     @abstractmethod
     async def get_items(
         self,
@@ -1,35 +1,72 @@
-from typing import Any, Callable, cast
+import logging
+from typing import Any, Callable, Mapping, cast
 from uuid import UUID
 
 from elasticsearch import NotFoundError
+from pydantic import BaseModel
 
 import models.models as models
-from cache import cache_decorator
+from cache import FAILED, cache_decorator, cache_many_decorator
 from core.pagination import PaginateQueryParams
+from core.sorting import sort_clause, sort_fields
 from db.abc import ElasticManagerABC
 
 from .abc import FilmStorageABC, GenreStorageABC, PersonStorageABC
 
+# Части ответа search, которые читают хранилища: _source найденных документов
+# и число совпадений во вложенных inner_hits для ролей персон
+HITS_FILTER_PATH = ("hits.hits._source",)
+ROLES_FILTER_PATH = (*HITS_FILTER_PATH, "hits.hits.inner_hits.*.hits.total.value")
+
 
 class ElasticUtilsMixin:
     def _sort_2_order(self, sort: str | None) -> dict[str, Any]:
-        if not sort:
-            return {"sort": "id:asc"}
+        return {"sort": sort_clause(sort)}
+
+    def _sort_2_body(self, sort: str | None) -> dict[str, Any]:
+        """
+        Сортировка для тела запроса: вид field:order понимает только
+        параметр URL, а тела msearch уходят в elasticsearch как есть
+        """
+        return {
+            "sort": [{field: {"order": order}} for field, order in sort_fields(sort)]
+        }
+
+    def _trim_response(self, *filter_path: str) -> dict[str, Any]:
+        """
+        Аргументы search, убирающие из ответа служебные поля (_shards, took,
+        _index, _score) и подсчёт общего числа совпадений, который хранилища
+        не читают. filter_path - оставляемые части ответа
+        """
+        return {
+            "filter_path": ",".join(filter_path or HITS_FILTER_PATH),
+            "track_total_hits": False,
+        }
 
-        match sort[0]:
-            case "+":
-                return {"sort": f"{sort[1:]}:asc"}
-            case "-":
-                return {"sort": f"{sort[1:]}:desc"}
-            case _:
-                return {"sort": "id:asc"}
+    def _hits(self, doc: Mapping[str, Any]) -> list[dict[str, Any]]:
+        # С filter_path у пустой выдачи нет ключа hits
+        return doc["hits"]["hits"] if "hits" in doc else []
+
+    def _source_fields(self, model: type[BaseModel]) -> list[str]:
+        """
+        Поля документа, из которых строится model
+        """
+        return list(model.__fields__)
 
     def pagination_2_query_args(
         self, pagination: None | PaginateQueryParams
-    ) -> dict[str, int]:
+    ) -> dict[str, Any]:
         if not pagination:
             return {}
-        return {"from": pagination.page_number, "size": pagination.page_size}
+        if pagination.search_after is not None:
+            return {
+                "search_after": pagination.search_after,
+                "size": pagination.page_size,
+            }
+        return {
+            "from": (pagination.page_number - 1) * pagination.page_size,
+            "size": pagination.page_size,
+        }
 
 
 class FilmElasticStorage(ElasticUtilsMixin, FilmStorageABC):
@@ -41,7 +78,7 @@ class FilmElasticStorage(ElasticUtilsMixin, FilmStorageABC):
             "writers_inner_hits": "writer",
         }
 
-    @cache_decorator()
+    @cache_decorator(stale_while_revalidate=True, distributed_lock=True, entity='film')
     async def _get_films_from_elastic(
         self, sort_order: str | None, pagination
     ) -> list[models.FilmShort] | None:
@@ -54,21 +91,38 @@ class FilmElasticStorage(ElasticUtilsMixin, FilmStorageABC):
 
         try:
             doc = await self.manager().search(
-                index="movies", body=body, **self._sort_2_order(sort_order)
+                index="movies",
+                body=body,
+                **self._sort_2_order(sort_order),
+                **self._trim_response(),
             )
         except NotFoundError:
             return None
-        return [models.FilmShort(**hit["_source"]) for hit in doc["hits"]["hits"]]
+        return [models.FilmShort(**hit["_source"]) for hit in self._hits(doc)]
 
-    @cache_decorator()
+    @cache_decorator(tags=['film:{item_id}'])
     async def get_item(self, item_id: UUID) -> models.FilmShort | None:
         try:
-            doc = await self.manager().get(index='movies', id=item_id)
-
+            source = await self.manager().get_source(
+                'movies', item_id, self._source_fields(models.Film)
+            )
         except NotFoundError:
             return None
 
-        return models.Film(**doc.body['_source'])
+        return models.Film(**source) if source else None
+
+    @cache_many_decorator(entity='film')
+    async def get_items_by_ids(
+        self, item_ids: list[UUID]
+    ) -> list[models.FilmShort | None]:
+        try:
+            sources = await self.manager().get_sources(
+                'movies', item_ids, ["id", "imdb_rating", "title"]
+            )
+        except NotFoundError:
+            return [None] * len(item_ids)
+
+        return [models.FilmShort(**source) if source else None for source in sources]
 
     async def get_items(
         self,
@@ -90,7 +144,9 @@ class FilmElasticStorage(ElasticUtilsMixin, FilmStorageABC):
 
         return await self._get_films_from_elastic(sort_order, pagination)
 
-    @cache_decorator()
+    @cache_decorator(
+        stale_while_revalidate=True, tags=['genre:{genre_id}'], entity='film'
+    )
     async def get_films_by_genre(
         self,
         sort_order: str | None,
@@ -120,13 +176,18 @@ class FilmElasticStorage(ElasticUtilsMixin, FilmStorageABC):
 
         try:
             doc = await self.manager().search(
-                index="movies", body=body, **self._sort_2_order(sort_order)
+                index="movies",
+                body=body,
+                **self._sort_2_order(sort_order),
+                **self._trim_response(),
             )
         except NotFoundError:
             return None
-        return [models.FilmShort(**hit["_source"]) for hit in doc["hits"]["hits"]]
+        return [models.FilmShort(**hit["_source"]) for hit in self._hits(doc)]
 
-    @cache_decorator()
+    @cache_decorator(
+        stale_while_revalidate=True, tags=['film:{film_id}'], entity='film'
+    )
     async def get_similar_films(
         self,
         sort_order: str | None,
@@ -135,29 +196,31 @@ class FilmElasticStorage(ElasticUtilsMixin, FilmStorageABC):
     ) -> list[models.FilmShort] | None:
         """Получить похожие фильмы. Похожими фильмами являются фильмы в одном жанре"""
         try:
-            doc = await self.manager().get(index='movies', id=film_id)
+            film = await self.manager().get_source('movies', film_id, ['genres'])
         except NotFoundError:
             return None
-        genres_to_search = [elem['name'] for elem in doc['_source']['genres']]
+        if film is None:
+            return None
+        genres_to_search = [elem['name'] for elem in film['genres']]
         query = {"bool": {"filter": [{"terms": {"genre": genres_to_search}}]}}
         body = {
             **self.pagination_2_query_args(pagination),
             "query": query,
             "_source": ["id", "imdb_rating", "title"],
         }
-        if pagination:
-            body["from"] = pagination.page_number
-            body["size"] = pagination.page_size
 
         try:
             doc = await self.manager().search(
-                index="movies", body=body, **self._sort_2_order(sort_order)
+                index="movies",
+                body=body,
+                **self._sort_2_order(sort_order),
+                **self._trim_response(),
             )
         except NotFoundError:
             return None
-        return [models.FilmShort(**hit["_source"]) for hit in doc["hits"]["hits"]]
+        return [models.FilmShort(**hit["_source"]) for hit in self._hits(doc)]
 
-    @cache_decorator()
+    @cache_decorator(entity='film')
     async def get_by_query(
         self, query: str, sort_order: str | None, pagination: PaginateQueryParams
     ) -> list[models.FilmShort] | None:
@@ -170,13 +233,16 @@ class FilmElasticStorage(ElasticUtilsMixin, FilmStorageABC):
             }
 
             doc = await self.manager().search(
-                index="movies", body=body, **self._sort_2_order(sort_order)
+                index="movies",
+                body=body,
+                **self._sort_2_order(sort_order),
+                **self._trim_response(),
             )
         except NotFoundError:
             return None
-        return [models.FilmShort(**hit["_source"]) for hit in doc["hits"]["hits"]]
+        return [models.FilmShort(**hit["_source"]) for hit in self._hits(doc)]
 
-    @cache_decorator()
+    @cache_decorator(tags=['person:{person_id}'], entity='film')
     async def get_films_by_person(
         self,
         sort_order: str | None,
@@ -217,95 +283,138 @@ class FilmElasticStorage(ElasticUtilsMixin, FilmStorageABC):
             }
 
             doc = await self.manager().search(
-                index="movies", body=body, **self._sort_2_order(sort_order)
+                index="movies",
+                body=body,
+                **self._sort_2_order(sort_order),
+                **self._trim_response(),
             )
 
         except NotFoundError:
             return None
 
-        return [models.FilmShort(**hit["_source"]) for hit in doc["hits"]["hits"]]
+        return [models.FilmShort(**hit["_source"]) for hit in self._hits(doc)]
 
-    @cache_decorator()
     async def get_films_with_roles_by_person(
         self,
         sort_order: str | None,
         pagination: PaginateQueryParams | None,
         person_id: UUID,
     ) -> list[models.FilmRoles] | None:
-        def parse_roles(inner_hits: dict) -> list[str]:
-            return list(
-                self._person_roles[name]
-                for name, hit in inner_hits.items()
-                if bool(hit["hits"]["total"]["value"]) and name in self._person_roles
+        films = await self.get_films_with_roles_by_persons(
+            sort_order, pagination, [person_id]
+        )
+        return films[0]
+
+    @cache_many_decorator(
+        ids_argument='person_ids', tags=['person:{person_ids}'], result_tag='film'
+    )
+    async def get_films_with_roles_by_persons(
+        self,
+        sort_order: str | None,
+        pagination: PaginateQueryParams | None,
+        person_ids: list[UUID],
+    ) -> list[list[models.FilmRoles] | None]:
+        searches: list[dict] = []
+        for person_id in person_ids:
+            searches.append({"index": "movies"})
+            searches.append(
+                {
+                    **self.pagination_2_query_args(pagination),
+                    **self._sort_2_body(sort_order),
+                    "query": self._person_roles_query(person_id),
+                    "_source": ["id", "imdb_rating", "title"],
+                    "track_total_hits": False,
+                }
             )
 
         try:
-            query = {
-                "bool": {
-                    "should": [
-                        {
-                            "nested": {
-                                "path": "actors",
-                                "query": {"match": {"actors.id": person_id}},
-                                "inner_hits": {"name": "actors_inner_hits", "size": 0},
-                            }
-                        },
-                        {
-                            "nested": {
-                                "path": "writers",
-                                "query": {"match": {"writers.id": person_id}},
-                                "inner_hits": {"name": "writers_inner_hits", "size": 0},
-                            }
-                        },
-                        {
-                            "nested": {
-                                "path": "directors",
-                                "query": {"match": {"directors.id": person_id}},
-                                "inner_hits": {
-                                    "name": "directors_inner_hits",
-                                    "size": 0,
-                                },
-                            }
-                        },
-                    ]
-                }
-            }
-            source = ["id", "imdb_rating", "title"]
+            # status оставляет в responses место для пустых ответов
+            docs = await self.manager().msearch(
+                searches=searches,
+                filter_path=",".join(
+                    f"responses.{path}"
+                    for path in ("status", "error", *ROLES_FILTER_PATH)
+                ),
+            )
+        except NotFoundError:
+            return [None] * len(person_ids)
 
-            body = {
-                **self.pagination_2_query_args(pagination),
-                "query": query,
-                "_source": source,
+        return [self._parse_film_roles(response) for response in docs["responses"]]
+
+    def _person_roles_query(self, person_id: UUID) -> dict[str, Any]:
+        return {
+            "bool": {
+                "should": [
+                    {
+                        "nested": {
+                            "path": path,
+                            "query": {"match": {f"{path}.id": person_id}},
+                            "inner_hits": {"name": inner_hits, "size": 0},
+                        }
+                    }
+                    for inner_hits, path in (
+                        ("actors_inner_hits", "actors"),
+                        ("writers_inner_hits", "writers"),
+                        ("directors_inner_hits", "directors"),
+                    )
+                ]
             }
+        }
 
-            docs = await self.manager().search(
-                index="movies", body=body, **self._sort_2_order(sort_order)
-            )
+    def _parse_film_roles(self, response: dict[str, Any]) -> list[models.FilmRoles]:
+        if "error" in response:
+            # Ошибка (отказ из-за перегрузки, сбой шарда) - не "фильмов нет":
+            # FAILED не попадает в кэш, вызывающий получит None
+            logging.error("Failed to get films by person: %s", response["error"])
+            return cast(list[models.FilmRoles], FAILED)
 
-        except NotFoundError:
-            return None
+        return [
+            models.FilmRoles(
+                **hit["_source"], roles=self._parse_roles(hit["inner_hits"])
+            )
+            for hit in self._hits(response)
+        ]
 
+    def _parse_roles(self, inner_hits: dict) -> list[str]:
         return list(
-            models.FilmRoles(**hit["_source"], roles=parse_roles(hit["inner_hits"]))
-            for hit in docs["hits"]["hits"]
+            self._person_roles[name]
+            for name, hit in inner_hits.items()
+            if bool(hit["hits"]["total"]["value"]) and name in self._person_roles
         )
 
 
 class GenreElasticStorage(ElasticUtilsMixin, GenreStorageABC):
+    # Верхняя граница числа жанров в агрегации популярности
+    max_genres = 1000
+
     def __init__(self, manager: Callable[[], ElasticManagerABC]):
         self.manager = manager
 
-    @cache_decorator()
+    @cache_decorator(tags=['genre:{item_id}'])
     async def get_item(self, item_id: UUID) -> models.GenreShort | None:
         try:
-            doc = await self.manager().get(index='genres', id=item_id)
-
+            source = await self.manager().get_source(
+                'genres', item_id, self._source_fields(models.GenreShort)
+            )
         except NotFoundError:
             return None
 
-        return models.GenreShort(**doc.body['_source'])
+        return models.GenreShort(**source) if source else None
 
-    @cache_decorator()
+    @cache_many_decorator(entity='genre')
+    async def get_items_by_ids(
+        self, item_ids: list[UUID]
+    ) -> list[models.GenreShort | None]:
+        try:
+            sources = await self.manager().get_sources(
+                'genres', item_ids, ["id", "name"]
+            )
+        except NotFoundError:
+            return [None] * len(item_ids)
+
+        return [models.GenreShort(**source) if source else None for source in sources]
+
+    @cache_decorator(tags=['genre:{genre_id}'])
     async def get_genre_popularity(self, genre_id: UUID) -> float | None:
         query: dict = {
             "bool": {
@@ -324,7 +433,11 @@ class GenreElasticStorage(ElasticUtilsMixin, GenreStorageABC):
 
         try:
             results = await self.manager().search(
-                index="movies", query=query, aggs=aggs
+                index="movies",
+                query=query,
+                aggs=aggs,
+                size=0,
+                **self._trim_response("aggregations"),
             )
 
         except NotFoundError:
@@ -333,6 +446,43 @@ class GenreElasticStorage(ElasticUtilsMixin, GenreStorageABC):
         return results["aggregations"]["avg_imdb_rating"]["value"]
 
     @cache_decorator()
+    async def get_genres_popularity(self) -> list[models.GenrePopularity] | None:
+        aggs: dict = {
+            "genres": {
+                "nested": {"path": "genres"},
+                "aggs": {
+                    "ids": {
+                        "terms": {"field": "genres.id", "size": self.max_genres},
+                        "aggs": {
+                            "movies": {
+                                "reverse_nested": {},
+                                "aggs": {
+                                    "avg_imdb_rating": {"avg": {"field": "imdb_rating"}}
+                                },
+                            }
+                        },
+                    }
+                },
+            }
+        }
+
+        try:
+            results = await self.manager().search(
+                index="movies", size=0, aggs=aggs, **self._trim_response("aggregations")
+            )
+        except NotFoundError:
+            return None
+
+        return [
+            models.GenrePopularity(
+                id=bucket["key"],
+                popularity=bucket["movies"]["avg_imdb_rating"]["value"],
+                films_count=bucket["movies"]["doc_count"],
+            )
+            for bucket in results["aggregations"]["genres"]["ids"]["buckets"]
+        ]
+
+    @cache_decorator(stale_while_revalidate=True, result_tag='genre')
     async def get_items(
         self,
         filters: dict[str, Any] | None = None,
@@ -352,32 +502,47 @@ class GenreElasticStorage(ElasticUtilsMixin, GenreStorageABC):
 
         try:
             doc = await self.manager().search(
-                index="genres", body=body, **self._sort_2_order(sort_order)
+                index="genres",
+                body=body,
+                **self._sort_2_order(sort_order),
+                **self._trim_response(),
             )
 
         except NotFoundError:
             return None
 
-        return list(
-            models.GenreShort(**hit["_source"]) for hit in doc.body['hits']['hits']
-        )
+        return list(models.GenreShort(**hit["_source"]) for hit in self._hits(doc))
 
 
 class PersonElasticStorage(ElasticUtilsMixin, PersonStorageABC):
     def __init__(self, manager: Callable[[], ElasticManagerABC]):
         self.manager = manager
 
-    @cache_decorator()
+    @cache_decorator(tags=['person:{person_id}'])
     async def get_item(self, person_id: UUID) -> models.PersonShort | None:
         try:
-            doc = await self.manager().get(index='persons', id=person_id)
-
+            source = await self.manager().get_source(
+                'persons', person_id, self._source_fields(models.PersonShort)
+            )
         except NotFoundError:
             return None
 
-        return models.PersonShort(**doc.body['_source'])
+        return models.PersonShort(**source) if source else None
 
-    @cache_decorator()
+    @cache_many_decorator(entity='person')
+    async def get_items_by_ids(
+        self, item_ids: list[UUID]
+    ) -> list[models.PersonShort | None]:
+        try:
+            sources = await self.manager().get_sources(
+                'persons', item_ids, ["id", "full_name"]
+            )
+        except NotFoundError:
+            return [None] * len(item_ids)
+
+        return [models.PersonShort(**source) if source else None for source in sources]
+
+    @cache_decorator(entity='person')
     async def get_items(
         self,
         filters: dict[str, Any] | None = None,
@@ -397,10 +562,13 @@ class PersonElasticStorage(ElasticUtilsMixin, PersonStorageABC):
 
         try:
             doc = await self.manager().search(
-                index="persons", body=body, **self._sort_2_order(sort_order)
+                index="persons",
+                body=body,
+                **self._sort_2_order(sort_order),
+                **self._trim_response(),
             )
 
         except NotFoundError:
             return None
 
-        return list(models.PersonShort(**hit["_source"]) for hit in doc["hits"]["hits"])
+        return list(models.PersonShort(**hit["_source"]) for hit in self._hits(doc))
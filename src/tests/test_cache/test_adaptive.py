@@ -0,0 +1,42 @@
+import pytest
+
+from cache.adaptive import AdaptiveTTL, CountMinSketch, FixedTTL, get_ttl_policy
+from core.config import CachePolicy
+
+
+def test_count_min_sketch_estimates_and_ages():
+    sketch = CountMinSketch(width=64, depth=4, sample_size=100)
+    for _ in range(10):
+        sketch.add('hot')
+    sketch.add('cold')
+
+    assert sketch.estimate('hot') >= 10
+    assert sketch.estimate('cold') >= 1
+    assert sketch.estimate('missing') <= 1
+
+    for i in range(89):
+        sketch.add(f'other:{i}')
+    assert sketch.additions == 0
+    assert 5 <= sketch.estimate('hot') < 10
+
+
+@pytest.mark.parametrize(
+    'touches,expected', [(0, 0), (1, 15), (3, 60), (8, 240), (20, 240)]
+)
+def test_adaptive_ttl_scales_by_frequency(touches, expected):
+    policy = AdaptiveTTL(
+        CountMinSketch(width=1024, depth=4, sample_size=10_000),
+        hot_threshold=8,
+        hot_factor=4,
+        cold_factor=0.25,
+        admission_threshold=1,
+    )
+    for _ in range(touches):
+        policy.touch('key')
+
+    assert policy.scale('key', 60) == expected
+
+
+def test_get_ttl_policy():
+    assert type(get_ttl_policy(CachePolicy(adaptive_ttl=False))) is FixedTTL
+    assert isinstance(get_ttl_policy(CachePolicy(adaptive_ttl=True)), AdaptiveTTL)
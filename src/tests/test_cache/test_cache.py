@@ -1,61 +1,110 @@
-from datetime import datetime
+import os
 from unittest.mock import AsyncMock
+from uuid import UUID, uuid4
 
 import fakeredis
+import fakeredis.aioredis
 import pytest
 
-from cache.cache import Cache, expired, prepare_key
+import models.models as models
+from cache.cache import (
+    COMPRESSED,
+    MISSING,
+    Cache,
+    RedisCacheStorage,
+    build_tags,
+    cache_decorator,
+    get_codec,
+    prepare_key,
+)
+from cache.keys import CACHE_KEY_VERSION
+from core.config import settings
+from core.pagination import PaginateQueryParams, encode_cursor
+from core.search import normalize_query
 from db.redis import RedisClient
 
 
+class FilmStorage:
+    def __init__(self, name: str):
+        self.name = name
+
+    async def get_films(
+        self,
+        sort_order: str | None,
+        pagination: PaginateQueryParams | None,
+        genre_id: UUID | None = None,
+    ):
+        ...
+
+
+GENRE_ID = UUID('3d8d9bf5-0d90-4353-88ba-4ccc5d2c07ff')
+
+
 @pytest.mark.parametrize(
-    'args,kwargs,expected',
+    'args,kwargs',
+    [
+        ([sum, [1, 2, 3]], {'start': 10}),
+        ([lambda x: x, 1], {}),
+        ([str.upper, "hello"], {}),
+    ],
+)
+def test_prepare_key(args, kwargs):
+    key = prepare_key(*args, **kwargs)
+    prefix, version, namespace, digest = key.split(':')
+
+    assert prefix == settings.cache_key_prefix
+    assert version == f'v{CACHE_KEY_VERSION}'
+    assert namespace == args[0].__qualname__
+    assert len(digest) == 32
+    assert key == prepare_key(*args, **kwargs)
+
+
+@pytest.mark.parametrize(
+    'first,second',
     [
         (
-            [sum, [1, 2, 3]],
-            {'start': 10},
-            '{"callable": "sum", "args": [[1, 2, 3]], "kwargs": [["start", 10]]}',
-        ),
-        (
-            [lambda x: x, 1],
-            {'b': 2},
-            '{"callable": "<lambda>", "args": [1], "kwargs": [["b", 2]]}',
+            (FilmStorage('a'), '-imdb_rating', PaginateQueryParams(1, 50), GENRE_ID),
+            (FilmStorage('b'), '-imdb_rating', PaginateQueryParams(1, 50), GENRE_ID),
         ),
         (
-            [str.upper, "hello"],
-            {},
-            '{"callable": "upper", "args": ["hello"], "kwargs": []}',
+            (FilmStorage('a'), None, PaginateQueryParams(2, 10)),
+            (FilmStorage('a'), '+id', PaginateQueryParams(2, 10), None),
         ),
     ],
 )
-def test_prepare_key(args, kwargs, expected):
-    # Проверяем, что функция возвращает строку
-    assert isinstance(prepare_key(print), str)
-
-    # Проверяем, что ключи функции правильно сериализуются в строку
-    assert prepare_key(*args, **kwargs) == expected
+def test_prepare_key_is_canonical(first, second):
+    assert prepare_key(FilmStorage.get_films, *first) == prepare_key(
+        FilmStorage.get_films, *second
+    )
+    assert prepare_key(FilmStorage.get_films, *first) == prepare_key(
+        FilmStorage.get_films,
+        first[0],
+        pagination=first[2],
+        sort_order=first[1],
+        genre_id=first[3] if len(first) > 3 else None,
+    )
 
 
 @pytest.mark.parametrize(
-    'now, expired_time, recent_time',
+    'first,second',
     [
         (
-            datetime(2023, 4, 28, 12, 0, 0),
-            datetime(2023, 4, 28, 11, 50, 0),
-            datetime(2023, 4, 28, 11, 59, 59),
-        )
+            (None, PaginateQueryParams(1, 50), GENRE_ID),
+            (None, PaginateQueryParams(2, 50), GENRE_ID),
+        ),
+        (
+            (None, PaginateQueryParams(1, 50), GENRE_ID),
+            (None, PaginateQueryParams(1, 50, encode_cursor(['id'])), GENRE_ID),
+        ),
+        (('-imdb_rating', None, GENRE_ID), ('+imdb_rating', None, GENRE_ID)),
+        ((None, None, GENRE_ID), (None, None, uuid4())),
     ],
 )
-def test_expired(mocker, now, expired_time, recent_time):
-    mocked_datetime = mocker.patch('cache.cache.datetime')
-    # Set the current datetime to a fixed value
-    mocked_datetime.now.return_value = now
-
-    # Assert that the function returns True for the old timestamp
-    assert expired(expired_time) == True
-
-    # Assert that the function returns False for the recent timestamp
-    assert expired(recent_time) == False
+def test_prepare_key_distinguishes_arguments(first, second):
+    storage = FilmStorage('a')
+    assert prepare_key(FilmStorage.get_films, storage, *first) != prepare_key(
+        FilmStorage.get_films, storage, *second
+    )
 
 
 @pytest.fixture
@@ -70,7 +119,7 @@ def redis_client():
 
 @pytest.fixture
 def cache(redis_client):
-    return Cache(redis_client)
+    return Cache(RedisCacheStorage(redis_client))
 
 
 @pytest.mark.parametrize('key,value', [('my_key', {'my_value': 42})])
@@ -79,3 +128,270 @@ async def test_get_cache(cache, key, value):
     await cache.set(key, value)
     result = await cache.get(key)
     assert result == value
+
+
+@pytest.mark.asyncio
+async def test_redis_storage_sets_expiration():
+    redis = fakeredis.aioredis.FakeRedis()
+    storage = RedisCacheStorage(redis)
+
+    await storage.set('key', b'value', expire=60)
+    value, ttl = await storage.get_with_ttl('key')
+
+    assert value == b'value'
+    assert 0 < ttl <= 60
+    assert 0 < await redis.pttl('key') <= 60_000
+
+
+@pytest.mark.asyncio
+async def test_redis_storage_without_expiration():
+    storage = RedisCacheStorage(fakeredis.aioredis.FakeRedis())
+
+    await storage.set('key', b'value')
+
+    assert await storage.get_with_ttl('key') == (b'value', None)
+    assert await storage.get_with_ttl('missing') == (None, None)
+
+
+FILM = models.Film(
+    uuid=GENRE_ID,
+    title='Star Wars',
+    imdb_rating=8.7,
+    genres=[models.GenreShort(uuid=GENRE_ID, name='Action')],
+    actors=[models.PersonShort(uuid=GENRE_ID, full_name='Harrison Ford')],
+)
+
+
+@pytest.mark.parametrize('codec', ['orjson', 'pickle'])
+@pytest.mark.parametrize(
+    'value',
+    [
+        [models.FilmShort(uuid=GENRE_ID, title='Star Wars', imdb_rating=8.7)],
+        FILM,
+        {'films': [FILM], 'ids': [str(GENRE_ID)]},
+        7.5,
+        None,
+        [],
+    ],
+)
+@pytest.mark.asyncio
+async def test_cache_codecs_roundtrip(cache, codec, value):
+    await cache.set('key', value, codec=codec)
+    result = await cache.get('key')
+
+    assert result == value
+    assert type(result) is type(value)
+
+
+@pytest.mark.asyncio
+async def test_cache_falls_back_to_pickle(cache, redis_client):
+    value = {1, 2, 3}
+    await cache.set('key', value, codec='orjson')
+
+    assert await cache.get('key') == value
+    stored = redis_client.set.call_args.args[1]
+    assert stored[0] == get_codec('pickle').id
+
+
+@pytest.mark.asyncio
+async def test_cache_refuses_pickle_when_disallowed(mocker, cache):
+    await cache.set('key', {1, 2, 3}, codec='pickle')
+    mocker.patch.object(settings, 'cache_allow_pickle', False)
+
+    assert await cache.get('key') is None
+
+
+@pytest.mark.asyncio
+async def test_cache_skips_pickle_fallback_when_disallowed(mocker):
+    mocker.patch.object(settings, 'cache_allow_pickle', False)
+    redis = fakeredis.aioredis.FakeRedis()
+    cache = Cache(RedisCacheStorage(redis))
+
+    await cache.set('no-pickle', {1, 2, 3}, codec='orjson')
+    await cache.set_many(
+        {'no-pickle-set': {1, 2, 3}, 'no-pickle-list': [1, 2, 3]}, codec='orjson'
+    )
+
+    assert not await redis.exists('no-pickle', 'no-pickle-set')
+    assert await cache.get('no-pickle-list') == [1, 2, 3]
+
+
+@pytest.mark.parametrize('codec', ['orjson', 'pickle'])
+@pytest.mark.asyncio
+async def test_cache_compresses_large_values(mocker, cache, redis_client, codec):
+    mocker.patch.object(settings, 'cache_compression_threshold_bytes', 512)
+    films = [
+        models.FilmShort(uuid=uuid4(), title='Star Wars', imdb_rating=8.7)
+        for _ in range(50)
+    ]
+
+    await cache.set('small', films[:1], codec=codec)
+    await cache.set('large', films, codec=codec)
+
+    small = redis_client.set.call_args_list[0].args[1]
+    large = redis_client.set.call_args_list[1].args[1]
+    assert small[0] == get_codec(codec).id
+    assert large[0] == get_codec(codec).id | COMPRESSED
+
+    assert await cache.get('small') == films[:1]
+    assert await cache.get('large') == films
+
+    stats = cache.get_stats()['compression']
+    assert stats['compressed'] == 1
+    assert stats['decompressed'] == 1
+    assert stats['ratio'] > 1
+
+
+@pytest.mark.asyncio
+async def test_cache_counts_only_stored_compression(mocker, cache, redis_client):
+    mocker.patch.object(settings, 'cache_compression_threshold_bytes', 16)
+    incompressible = os.urandom(256)
+
+    await cache.set('random', incompressible, codec='pickle')
+
+    assert not redis_client.set.call_args.args[1][0] & COMPRESSED
+    stats = cache.get_stats()['compression']
+    assert stats['compressed'] == 0
+    assert stats['raw_bytes'] == stats['compressed_bytes'] == 0
+    assert stats['discarded'] == 1
+
+
+@pytest.mark.asyncio
+async def test_cache_distinguishes_cached_none_from_missing_key(cache):
+    await cache.set('none', None)
+
+    assert await cache.get('none', default=MISSING) is None
+    assert await cache.get('missing', default=MISSING) is MISSING
+
+
+@pytest.fixture
+def redis_storage() -> RedisCacheStorage:
+    storage = RedisCacheStorage(fakeredis.aioredis.FakeRedis())
+    storage.batch_size = 2
+    return storage
+
+
+@pytest.mark.asyncio
+async def test_redis_storage_invalidates_tags(redis_storage):
+    await redis_storage.set('page', b'1', expire=60, tags=['film:1', 'film:2'])
+    await redis_storage.set('details', b'2', expire=60, tags=['film:1'])
+    await redis_storage.set('other', b'3', expire=60, tags=['film:3'])
+    for i in range(5):
+        await redis_storage.set(f'genre_page_{i}', b'4', tags=['film:2'])
+
+    removed = await redis_storage.invalidate_tags(['film:1'])
+
+    assert sorted(removed) == ['details', 'page']
+    assert await redis_storage.get('page') is None
+    assert await redis_storage.get('other') == b'3'
+
+    # Ключи, уже удалённые по другому тегу, тоже попадают в список
+    removed = await redis_storage.invalidate_tags(['film:2'])
+    assert sorted(removed) == [
+        'genre_page_0',
+        'genre_page_1',
+        'genre_page_2',
+        'genre_page_3',
+        'genre_page_4',
+        'page',
+    ]
+
+
+@pytest.mark.asyncio
+async def test_redis_storage_cleans_up_expired_keys_from_tags(redis_storage):
+    await redis_storage.set('alive', b'1', tags=['genre:1'])
+    await redis_storage.set('dead', b'2', tags=['genre:1', 'genre:2'])
+    await redis_storage.delete('dead')
+
+    assert await redis_storage.cleanup_tags() == 2
+    assert await redis_storage.invalidate_tags(['genre:1']) == ['alive']
+
+
+def test_build_tags():
+    async def get_films_by_genre(sort_order, pagination, genre_id):
+        ...
+
+    films = [
+        models.FilmShort(uuid=GENRE_ID, title='Star Wars'),
+        models.FilmShort(uuid=GENRE_ID, title='Star Wars'),
+    ]
+
+    assert build_tags(
+        get_films_by_genre, ['genre:{genre_id}'], 'film', films[:1], None, None, 'g'
+    ) == ['genre:g', f'film:{GENRE_ID}']
+    assert build_tags(get_films_by_genre, [], 'film', None, None, None, 'g') == []
+
+
+@pytest.mark.asyncio
+async def test_redis_storage_batches_keys(redis_storage):
+    await redis_storage.set_many(
+        {'first': b'1', 'second': b'2'}, expire=60, tags={'first': ['film:1']}
+    )
+
+    assert await redis_storage.get_many(['second', 'missing', 'first']) == [
+        b'2',
+        None,
+        b'1',
+    ]
+    assert 0 < (await redis_storage.get_with_ttl('second'))[1] <= 60
+
+    await redis_storage.delete_many(['second'])
+    assert await redis_storage.invalidate_tags(['film:1']) == ['first']
+    assert await redis_storage.get_many(['first', 'second']) == [None, None]
+
+
+@pytest.mark.asyncio
+async def test_cache_get_many_decodes_values():
+    cache = Cache(RedisCacheStorage(fakeredis.aioredis.FakeRedis()))
+    film = models.FilmShort(id=uuid4(), title='Star Wars', imdb_rating=8.6)
+
+    await cache.set_many({'film': film, 'none': None})
+
+    assert await cache.get_many(['film', 'none', 'missing'], default=MISSING) == [
+        film,
+        None,
+        MISSING,
+    ]
+
+
+@pytest.mark.asyncio
+async def test_cache_decorator_normalizes_entities():
+    redis = fakeredis.aioredis.FakeRedis()
+    cache = Cache(RedisCacheStorage(redis))
+    films = [
+        models.FilmShort(id=uuid4(), title='Star Wars', imdb_rating=8.6),
+        models.FilmShort(id=uuid4(), title='Star Trek', imdb_rating=7.9),
+    ]
+    calls = 0
+
+    async def get_films(page: int) -> list[models.FilmShort]:
+        nonlocal calls
+        calls += 1
+        return films
+
+    cached = cache_decorator(cache, entity='film')(get_films)
+
+    assert await cached(1) == films
+    assert await cached(1) == films
+    assert calls == 1
+    assert await cache.get(prepare_key(get_films, 1)) == [str(f.id) for f in films]
+
+    # Сброс фильма удаляет только его запись, список пересчитывается
+    assert await cache.invalidate_tags([f'film:{films[0].id}']) == 1
+    assert await cached(1) == films
+    assert calls == 2
+
+
+async def search_films(query: str):
+    ...
+
+
+@pytest.mark.parametrize(
+    'query', ['Star Wars', 'star wars ', 'STAR  WARS', 'Ｓtar\tWars']
+)
+def test_normalized_queries_share_cache_key(query):
+    assert normalize_query(query) == 'star wars'
+    assert prepare_key(search_films, normalize_query(query)) == prepare_key(
+        search_films, 'star wars'
+    )
+    assert prepare_key(search_films, query) != prepare_key(search_films, 'star wars')
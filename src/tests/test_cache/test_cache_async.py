@@ -1,16 +1,31 @@
-from datetime import datetime, timedelta
+import asyncio
 from unittest.mock import AsyncMock, MagicMock
+from uuid import UUID, uuid4
 
+import fakeredis.aioredis
 import pytest
 
-from cache.cache import Cache, cache_decorator, prepare_key
+from cache.cache import (
+    FAILED,
+    MISSING,
+    Cache,
+    RedisCacheStorage,
+    cache_decorator,
+    cache_many_decorator,
+    prepare_key,
+)
+from cache.keys import prepare_tag_key
+from core.config import CachePolicy, settings
+from models.models import FilmShort
 
 pytestmark = pytest.mark.asyncio
 
 
 @pytest.fixture
 def cache_storage() -> Cache:
-    return MagicMock(spec=Cache)
+    storage = MagicMock(spec=Cache)
+    storage.get_with_ttl.return_value = (MISSING, None)
+    return storage
 
 
 @pytest.fixture
@@ -18,20 +33,19 @@ def func() -> AsyncMock:
     return AsyncMock()
 
 
-@pytest.mark.parametrize(
-    'args,kwargs,expected',
-    [((1, 2), {}, {'timestamp': datetime.now(), 'response': 'cached_response'})],
-)
+@pytest.mark.parametrize('args,kwargs,expected', [((1, 2), {}, 'cached_response')])
 async def test_cache_decorator_returns_cached_value(
     cache_storage, func, args, kwargs, expected
 ):
-    cache_storage.get.return_value = expected
+    cache_storage.get_with_ttl.return_value = (expected, 100.0)
     key = prepare_key(func, *args, **kwargs)
     result = await cache_decorator(cache_storage)(func)(*args, **kwargs)
 
-    cache_storage.get.assert_called_once_with(key)
+    cache_storage.get_with_ttl.assert_called_once_with(
+        key, local=False, default=MISSING
+    )
     func.assert_not_called()
-    assert result == expected['response']
+    assert result == expected
 
 
 @pytest.mark.parametrize(
@@ -41,45 +55,286 @@ async def test_cache_decorator_calls_decorated_function_and_caches_response(
     cache_storage, func, args, kwargs, expected
 ):
     key = prepare_key(func, *args, **kwargs)
-    cache_storage.get.return_value = None
     func.return_value = expected
     result = await cache_decorator(cache_storage)(func)(*args, **kwargs)
 
-    cache_storage.get.assert_called_once_with(key)
+    cache_storage.get_with_ttl.assert_called_once_with(
+        key, local=False, default=MISSING
+    )
     func.assert_called_once_with(*args, **kwargs)
     cache_storage.set.assert_called_once()
     assert result == expected
 
 
+@pytest.mark.parametrize('jitter', [0.0, 0.5])
+async def test_cache_decorator_sets_expiration_in_storage(
+    mocker, cache_storage, func, jitter
+):
+    mocker.patch.object(settings, 'cache_expiration_jitter', jitter)
+    func.return_value = 'new_response'
+    await cache_decorator(cache_storage)(func)(1)
+
+    expire = cache_storage.set.call_args.kwargs['expire']
+    ttl = settings.cache_expiration_in_seconds
+    assert ttl <= expire <= ttl * (1 + jitter)
+
+
+@pytest.mark.parametrize('callers', [10])
+async def test_cache_decorator_coalesces_concurrent_misses(cache_storage, callers):
+    async def backend(*args):
+        await asyncio.sleep(0.01)
+        return 'new_response'
+
+    func = AsyncMock(side_effect=backend)
+    decorated = cache_decorator(cache_storage)(func)
+
+    results = await asyncio.gather(*(decorated(1, 2) for _ in range(callers)))
+
+    func.assert_awaited_once_with(1, 2)
+    cache_storage.set.assert_called_once()
+    assert results == ['new_response'] * callers
+
+
+async def test_cache_decorator_shares_backend_errors(cache_storage):
+    async def backend(*args):
+        await asyncio.sleep(0.01)
+        raise RuntimeError('backend is down')
+
+    func = AsyncMock(side_effect=backend)
+    decorated = cache_decorator(cache_storage)(func)
+
+    results = await asyncio.gather(decorated(1), decorated(1), return_exceptions=True)
+
+    func.assert_awaited_once()
+    cache_storage.set.assert_not_called()
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+@pytest.mark.parametrize('ttl,refreshed', [(30.0, True), (120.0, False), (None, False)])
+async def test_cache_decorator_serves_stale_while_revalidating(
+    cache_storage, func, ttl, refreshed
+):
+    cache_storage.get_with_ttl.return_value = ('cached_response', ttl)
+    func.return_value = 'new_response'
+    decorated = cache_decorator(cache_storage, stale_while_revalidate=True)(func)
+
+    result = await decorated(1)
+    # Даём фоновому обновлению завершиться
+    await asyncio.sleep(0)
+
+    assert result == 'cached_response'
+    assert func.await_count == int(refreshed)
+    assert cache_storage.set.call_count == int(refreshed)
+
+
+async def test_cache_decorator_keeps_stale_entries_for_grace_period(
+    mocker, cache_storage, func
+):
+    mocker.patch.object(settings, 'cache_expiration_jitter', 0.0)
+    func.return_value = 'new_response'
+    await cache_decorator(cache_storage, stale_while_revalidate=True)(func)(1)
+
+    expire = cache_storage.set.call_args.kwargs['expire']
+    assert expire == (
+        settings.cache_expiration_in_seconds
+        + settings.cache_stale_while_revalidate_in_seconds
+    )
+
+
+@pytest.mark.parametrize('negative', [None, []])
+async def test_cache_decorator_serves_cached_negative_results(
+    cache_storage, func, negative
+):
+    cache_storage.get_with_ttl.return_value = (negative, 30.0)
+    result = await cache_decorator(cache_storage)(func)(1)
+
+    func.assert_not_called()
+    assert result == negative
+
+
 @pytest.mark.parametrize(
-    'args,kwargs,timestamp,cached_result,new_result,expected',
+    'response,ttl',
     [
-        (
-            (1, 2),
-            {'a': 3, 'b': 4},
-            datetime.now() - timedelta(hours=1),
-            'cached_response',
-            'new_response',
-            'new_response',
-        ),
-        (
-            (1, 2),
-            {'a': 3, 'b': 4},
-            datetime.now() - timedelta(minutes=1),
-            'cached_response',
-            'new_response',
-            'cached_response',
-        ),
+        (None, settings.cache_negative_expiration_in_seconds),
+        ([], settings.cache_negative_expiration_in_seconds),
+        (0.0, settings.cache_expiration_in_seconds),
+        (['film'], settings.cache_expiration_in_seconds),
     ],
 )
-async def test_cache_decorator_raises_exception_if_cached_value_has_expired(
-    cache_storage, func, args, kwargs, timestamp, cached_result, new_result, expected
+async def test_cache_decorator_caches_negative_results_shorter(
+    mocker, cache_storage, func, response, ttl
 ):
-    key = prepare_key(func, *args, **kwargs)
-    cache_storage.get.return_value = {'timestamp': timestamp, 'response': cached_result}
+    mocker.patch.object(settings, 'cache_expiration_jitter', 0.0)
+    func.return_value = response
+    await cache_decorator(cache_storage)(func)(1)
 
-    func.return_value = new_result
-    result = await cache_decorator(cache_storage)(func)(*args, **kwargs)
+    assert cache_storage.set.call_args.kwargs['expire'] == ttl
 
-    cache_storage.get.assert_called_once_with(key)
-    assert result == expected
+
+async def test_cache_many_decorator_loads_only_missing_ids():
+    cache = Cache(RedisCacheStorage(fakeredis.aioredis.FakeRedis()))
+    calls = []
+
+    class Storage:
+        @cache_many_decorator(cache, ids_argument='item_ids')
+        async def get_items_by_ids(self, item_ids: list[int], lang: str = 'ru'):
+            calls.append(item_ids)
+            return [
+                {'id': item_id, 'lang': lang} if item_id > 0 else None
+                for item_id in item_ids
+            ]
+
+    storage = Storage()
+    first = await storage.get_items_by_ids([1, -1])
+    second = await storage.get_items_by_ids([2, 1, -1])
+    third = await storage.get_items_by_ids([1], lang='en')
+
+    assert first == [{'id': 1, 'lang': 'ru'}, None]
+    assert second == [{'id': 2, 'lang': 'ru'}, {'id': 1, 'lang': 'ru'}, None]
+    assert third == [{'id': 1, 'lang': 'en'}]
+    assert calls == [[1, -1], [2], [1]]
+
+
+async def test_cache_many_decorator_shares_entity_entries():
+    cache = Cache(RedisCacheStorage(fakeredis.aioredis.FakeRedis()))
+    films = [FilmShort(id=uuid4(), title=title) for title in ('a', 'b')]
+    calls = []
+
+    class Storage:
+        @cache_decorator(cache, entity='film')
+        async def get_films(self):
+            return films
+
+        @cache_many_decorator(cache, entity='film')
+        async def get_items_by_ids(self, item_ids: list[UUID]):
+            calls.append(item_ids)
+            return [None for _ in item_ids]
+
+    storage = Storage()
+    await storage.get_films()
+    missing = uuid4()
+    result = await storage.get_items_by_ids([films[1].id, missing, films[0].id])
+
+    assert result == [films[1], None, films[0]]
+    assert calls == [[missing]]
+
+
+async def test_cache_many_decorator_tags_entries_per_id(mocker):
+    mocker.patch.object(settings, 'cache_expiration_jitter', 0)
+    cache = Cache(RedisCacheStorage(fakeredis.aioredis.FakeRedis()))
+    films = {1: [FilmShort(id=uuid4(), title='a')], 2: []}
+
+    @cache_many_decorator(
+        cache,
+        ids_argument='person_ids',
+        tags=['person:{person_ids}'],
+        result_tag='film',
+    )
+    async def get_films_by_persons(person_ids: list[int]):
+        return [films[person_id] for person_id in person_ids]
+
+    assert await get_films_by_persons([1, 2]) == [films[1], []]
+
+    film_key, empty_key = (
+        prepare_key(get_films_by_persons, person_ids=person_id) for person_id in (1, 2)
+    )
+    _, ttl = await cache.get_with_ttl(empty_key)
+    assert ttl <= settings.cache_negative_expiration_in_seconds
+
+    await cache.invalidate_tags([f'film:{films[1][0].id}'])
+    assert await cache.get(film_key, default=MISSING) is MISSING
+    assert await cache.get(empty_key) == []
+
+    await cache.invalidate_tags(['person:2'])
+    assert await cache.get(empty_key, default=MISSING) is MISSING
+
+
+async def test_cache_many_decorator_does_not_cache_failures():
+    cache = Cache(RedisCacheStorage(fakeredis.aioredis.FakeRedis()))
+    calls = []
+
+    @cache_many_decorator(cache, ids_argument='person_ids')
+    async def get_films_by_persons(person_ids: list[int]):
+        calls.append(person_ids)
+        return [FAILED if len(calls) == 1 else [person_id] for person_id in person_ids]
+
+    assert await get_films_by_persons([7]) == [None]
+    assert await get_films_by_persons([7]) == [[7]]
+    assert calls == [[7], [7]]
+
+
+async def get_genres():
+    return ['genre']
+
+
+async def test_cache_decorator_applies_method_policy(mocker, cache_storage):
+    policy = CachePolicy(
+        expiration_in_seconds=3600, tier='local', max_payload_in_bytes=10
+    )
+    mocker.patch.dict(settings.cache_policies, {'get_genres': policy})
+    mocker.patch.object(settings, 'cache_expiration_jitter', 0)
+
+    await cache_decorator(cache_storage)(get_genres)()
+
+    cache_storage.get_with_ttl.assert_called_once_with(
+        prepare_key(get_genres), local=True, default=MISSING
+    )
+    kwargs = cache_storage.set.call_args.kwargs
+    assert kwargs['expire'] == 3600
+    assert kwargs['max_size'] == 10
+
+
+async def get_films_page(page_size: int):
+    return [FilmShort(id=uuid4(), title=f'Film {i}') for i in range(page_size)]
+
+
+@pytest.mark.parametrize('page_size,cached', [(50, True), (500, False)])
+async def test_entity_page_size_limits_entities(mocker, page_size, cached):
+    policy = CachePolicy(max_payload_in_bytes=16384)
+    mocker.patch.dict(settings.cache_policies, {'get_films_page': policy})
+    redis = fakeredis.aioredis.FakeRedis()
+    await redis.flushall()
+    decorated = cache_decorator(Cache(RedisCacheStorage(redis)), entity='film')(
+        get_films_page
+    )
+
+    await decorated(page_size)
+
+    assert bool(await redis.exists(prepare_key(get_films_page, page_size))) is cached
+    entities = await redis.keys('*:entity:film:*')
+    assert len(entities) == (page_size if cached else 0)
+
+
+async def test_cache_decorator_skips_disabled_methods(mocker, cache_storage):
+    mocker.patch.dict(
+        settings.cache_policies, {'get_genres': CachePolicy(enabled=False)}
+    )
+
+    assert cache_decorator(cache_storage)(get_genres) is get_genres
+
+
+async def test_cache_skips_values_over_max_size():
+    cache = Cache(RedisCacheStorage(fakeredis.aioredis.FakeRedis()))
+
+    await cache.set('small', ['genre'], max_size=100)
+    await cache.set('large', ['genre'] * 100, max_size=100)
+
+    assert await cache.get('small') == ['genre']
+    assert await cache.get('large', default=MISSING) is MISSING
+
+
+async def test_tag_sets_outlive_longest_policy(mocker):
+    mocker.patch.object(settings, 'cache_tag_expiration_in_seconds', 60)
+    mocker.patch.dict(
+        settings.cache_policies,
+        {'get_genres': CachePolicy(expiration_in_seconds=3600)},
+        clear=True,
+    )
+    client = fakeredis.aioredis.FakeRedis()
+    cache = Cache(RedisCacheStorage(client))
+
+    await cache.set('genres', ['genre'], expire=3600, tags=['genre:1'])
+
+    longest = 3600 * (1 + settings.cache_expiration_jitter)
+    longest += settings.cache_stale_while_revalidate_in_seconds
+    assert await client.ttl(prepare_tag_key('genre:1')) >= longest
@@ -0,0 +1,160 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import fakeredis.aioredis
+import pytest
+
+from cache.abc import CacheStorageABC
+from cache.bus import InvalidationBus
+from cache.cache import Cache, RedisCacheStorage, TieredCacheStorage, cache_decorator
+from cache.local import LocalCacheStorage
+from cache.snapshot import SnapshotError, read_snapshot
+from db.redis import RedisManager
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def local() -> LocalCacheStorage:
+    return LocalCacheStorage(max_size=2, expire=60)
+
+
+@pytest.fixture
+def remote() -> CacheStorageABC:
+    storage = AsyncMock(spec=CacheStorageABC)
+    storage.get_with_ttl.return_value = (None, None)
+    return storage
+
+
+async def test_local_storage_evicts_least_recently_used(local):
+    await local.set('a', b'1')
+    await local.set('b', b'2')
+    await local.get('a')
+    await local.set('c', b'3')
+
+    assert await local.get('b') is None
+    assert await local.get('a') == b'1'
+    assert await local.get('c') == b'3'
+    assert local.stats.evictions == 1
+
+
+async def test_local_storage_expires_entries(mocker, local):
+    mocked_time = mocker.patch('cache.local.time')
+    mocked_time.monotonic.return_value = 100
+    await local.set('a', b'1')
+
+    mocked_time.monotonic.return_value = 200
+    assert await local.get('a') is None
+    assert local.stats.expirations == 1
+    assert local.stats.misses == 1
+
+
+async def test_local_storage_keeps_record_expiration(mocker, local):
+    mocked_time = mocker.patch('cache.local.time')
+    mocked_time.monotonic.return_value = 100
+    await local.set('a', b'1', expire=10)
+
+    mocked_time.monotonic.return_value = 105
+    assert await local.get_with_ttl('a') == (b'1', 5)
+
+    mocked_time.monotonic.return_value = 110
+    assert await local.get('a') is None
+
+
+async def test_tiered_storage_populates_local_from_remote(local, remote):
+    remote.get_with_ttl.return_value = (b'value', 10.0)
+    storage = TieredCacheStorage(local, remote)
+
+    assert await storage.get('key') == b'value'
+    assert await storage.get('key') == b'value'
+
+    remote.get_with_ttl.assert_awaited_once_with('key')
+    assert local.stats.hits == 1
+
+
+async def test_cache_decorator_serves_hot_keys_from_local(local, remote):
+    func = AsyncMock(return_value='response')
+    decorated = cache_decorator(Cache(remote, local), local=True)(func)
+
+    assert await decorated(1) == 'response'
+    assert await decorated(1) == 'response'
+
+    func.assert_awaited_once()
+    remote.get_with_ttl.assert_awaited_once()
+    assert Cache(remote, local).get_stats()['local']['hits'] == 1
+
+
+async def test_invalidation_bus_evicts_keys_on_other_workers():
+    redis = fakeredis.aioredis.FakeRedis()
+    remote = RedisCacheStorage(redis)
+    workers = []
+    for _ in range(2):
+        local = LocalCacheStorage(max_size=10, expire=60)
+        bus = InvalidationBus(redis, 'invalidate', local)
+        workers.append(TieredCacheStorage(local, remote, bus))
+    writer, reader = workers
+
+    manager = RedisManager(redis)
+    manager.subscribe('invalidate', reader.bus.on_message, reader.bus.on_subscribe)
+    await manager.on_startup()
+    await asyncio.sleep(0.01)
+
+    await writer.set('key', b'old')
+    assert await reader.get('key') == b'old'
+    await writer.set('key', b'new')
+    for _ in range(100):
+        if not len(reader.local):
+            break
+        await asyncio.sleep(0.01)
+
+    assert await writer.local.get('key') == b'new'
+    assert await reader.local.get('key') is None
+    assert await reader.get('key') == b'new'
+
+    await manager.on_shutdown()
+
+
+async def test_local_storage_snapshot_roundtrip(mocker, tmp_path, local):
+    path = str(tmp_path / 'cache.snapshot')
+    mocked_time = mocker.patch('cache.local.time')
+    mocked_time.monotonic.return_value = 100
+    mocked_time.time.return_value = 1_000_000
+    await local.set('short', b'1', expire=5)
+    await local.set('long', b'2')
+
+    assert local.dump(path, limit=10) == 2
+
+    # Новый воркер через 10 секунд, монотонные часы у него свои
+    restored = LocalCacheStorage(max_size=2, expire=60)
+    mocked_time.monotonic.return_value = 7
+    mocked_time.time.return_value = 1_000_010
+    assert restored.load(path, max_age=60) == 1
+    assert await restored.get_with_ttl('long') == (b'2', None)
+    assert await restored.get('short') is None
+
+    mocked_time.time.return_value = 1_000_100
+    assert LocalCacheStorage(max_size=2, expire=60).load(path, max_age=60) == 0
+
+
+async def test_local_storage_snapshot_keeps_most_recent(tmp_path, local):
+    path = str(tmp_path / 'cache.snapshot')
+    await local.set('a', b'1')
+    await local.set('b', b'2')
+    await local.get('a')
+
+    assert local.dump(path, limit=1) == 1
+    _, records = read_snapshot(path)
+    assert [(record.key, record.value) for record in records] == [('a', b'1')]
+
+
+async def test_cache_ignores_broken_snapshot(tmp_path, local, remote):
+    path = tmp_path / 'cache.snapshot'
+    path.write_bytes(b'MVXL1')
+    cache = Cache(remote, local)
+
+    cache.load_snapshot(str(path), max_age=60)
+    cache.load_snapshot(str(tmp_path / 'missing'), max_age=60)
+
+    assert len(local) == 0
+    with pytest.raises(SnapshotError):
+        read_snapshot(str(path))
@@ -0,0 +1,89 @@
+import asyncio
+
+import fakeredis.aioredis
+import pytest
+
+from cache.cache import Cache, RedisCacheStorage, cache_decorator
+from cache.keys import prepare_key
+from cache.lock import LockLostError, RedisLock
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def redis() -> fakeredis.aioredis.FakeRedis:
+    return fakeredis.aioredis.FakeRedis()
+
+
+async def test_lock_is_exclusive_and_fenced(redis):
+    lock = RedisLock(redis, timeout=60)
+
+    first = await lock.acquire('key')
+    assert first is not None
+    assert await lock.acquire('key') is None
+
+    await redis.delete(first.key)  # аренда истекла
+    second = await lock.acquire('key')
+    assert second.token > first.token
+
+    await lock.release(first)
+    assert await lock.is_held(second)
+    await lock.release(second)
+    assert not await lock.is_held(second)
+
+
+async def test_fenced_write_requires_lock(redis):
+    storage = RedisCacheStorage(redis)
+    lock = RedisLock(redis, timeout=60)
+    fence = await lock.acquire('key')
+
+    await storage.set('key', b'1', expire=60, tags=['film:1'], fence=fence)
+    assert await storage.get('key') == b'1'
+
+    await lock.release(fence)
+    with pytest.raises(LockLostError):
+        await storage.set('key', b'2', expire=60, fence=fence)
+    assert await storage.get('key') == b'1'
+
+
+async def test_cache_decorator_recomputes_once_across_nodes(mocker, redis):
+    mocker.patch('core.config.settings.cache_lock_poll_interval_in_seconds', 0.01)
+    cache = Cache(RedisCacheStorage(redis), lock=RedisLock(redis, timeout=60))
+    calls = 0
+
+    async def get_films(page: int):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return [page]
+
+    # Каждый узел со своим SingleFlight, общая у них только блокировка в Redis
+    nodes = [cache_decorator(cache, distributed_lock=True)(get_films) for _ in range(3)]
+    results = await asyncio.gather(*(node(1) for node in nodes))
+
+    assert results == [[1], [1], [1]]
+    assert calls == 1
+    assert await redis.keys('*:lock:*:get_films:*') == []
+
+
+async def test_cache_decorator_miss_does_not_join_skipped_refresh(mocker, redis):
+    mocker.patch('core.config.settings.cache_lock_poll_interval_in_seconds', 0.01)
+    mocker.patch('core.config.settings.cache_lock_wait_in_seconds', 0.05)
+    lock = RedisLock(redis, timeout=60)
+    cache = Cache(RedisCacheStorage(redis), lock=lock)
+
+    async def get_popular(page: int):
+        await asyncio.sleep(0.01)
+        return [page]
+
+    decorated = cache_decorator(
+        cache, stale_while_revalidate=True, distributed_lock=True
+    )(get_popular)
+    await decorated(1)
+    key = prepare_key(get_popular, 1)
+    await redis.expire(key, 1)  # запись устарела
+    await lock.acquire(key)  # пересчитывает другой узел
+
+    assert await decorated(1) == [1]  # устаревшее значение, обновление пропущено
+    await redis.delete(key)
+    assert await decorated(1) == [1]
@@ -0,0 +1,99 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+from elasticsearch import NotFoundError
+
+from db.loader import DocumentError, ElasticBatchLoader
+
+pytestmark = pytest.mark.asyncio
+
+
+def mget_response(index, ids, source=None):
+    return {
+        'docs': [
+            {'_index': index, '_id': id_, 'found': True, '_source': {'id': id_}}
+            if id_ != 'missing'
+            else {'_index': index, '_id': id_, 'found': False}
+            for id_ in ids
+        ]
+    }
+
+
+@pytest.fixture
+def mget() -> AsyncMock:
+    return AsyncMock(side_effect=mget_response)
+
+
+async def test_loader_batches_concurrent_loads_per_index(mget):
+    loader = ElasticBatchLoader(mget)
+
+    results = await asyncio.gather(
+        loader.load('movies', '1'),
+        loader.load('movies', '2'),
+        loader.load('movies', '1'),
+        loader.load('movies', 'missing'),
+        loader.load('genres', '3'),
+        loader.load('movies', '4', source=['genres']),
+    )
+
+    assert results == [
+        {'id': '1'},
+        {'id': '2'},
+        {'id': '1'},
+        None,
+        {'id': '3'},
+        {'id': '4'},
+    ]
+    calls = [call.kwargs for call in mget.await_args_list]
+    assert len(calls) == 3
+    assert {'index': 'movies', 'ids': ['1', '2', 'missing']} in calls
+    assert {'index': 'genres', 'ids': ['3']} in calls
+    assert {'index': 'movies', 'ids': ['4'], 'source': ['genres']} in calls
+
+
+async def test_loader_sends_separate_batches_for_separate_ticks(mget):
+    loader = ElasticBatchLoader(mget)
+
+    assert await loader.load('movies', '1') == {'id': '1'}
+    assert await loader.load_many('movies', ['2', 'missing']) == [{'id': '2'}, None]
+    assert mget.await_count == 2
+
+
+async def test_loader_shares_errors(mget):
+    mget.side_effect = NotFoundError('index_not_found_exception', None, None)
+    loader = ElasticBatchLoader(mget, window=0.001)
+
+    results = await asyncio.gather(
+        loader.load('movies', '1'), loader.load('movies', '2'), return_exceptions=True
+    )
+
+    assert all(isinstance(result, NotFoundError) for result in results)
+    mget.assert_awaited_once()
+
+
+async def test_loader_handles_filtered_empty_source(mget):
+    # filter_path убирает пустой _source найденного документа
+    mget.side_effect = None
+    mget.return_value = {'docs': [{'_id': '1', 'found': True}]}
+    loader = ElasticBatchLoader(mget)
+
+    assert await loader.load('movies', '1', source=['genres']) == {}
+
+
+async def test_loader_fails_documents_with_errors(mget):
+    mget.side_effect = None
+    mget.return_value = {
+        'docs': [
+            {'_id': '1', 'error': {'type': 'no_shard_available_action_exception'}},
+            {'_id': '2', 'found': True, '_source': {'id': '2'}},
+        ]
+    }
+    loader = ElasticBatchLoader(mget)
+
+    failed, found = await asyncio.gather(
+        loader.load('movies', '1'), loader.load('movies', '2'), return_exceptions=True
+    )
+
+    assert isinstance(failed, DocumentError)
+    assert found == {'id': '2'}
@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+from elasticsearch import ConnectionError as ElasticConnectionError
+
+from services.concurrency import ServiceUnavailableError, gather
+
+pytestmark = pytest.mark.asyncio
+
+
+async def value(result, delay=0.0):
+    await asyncio.sleep(delay)
+    return result
+
+
+async def fail(error, delay=0.0):
+    await asyncio.sleep(delay)
+    raise error
+
+
+async def test_gather_runs_concurrently_and_keeps_order():
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+
+    results = await gather(value('slow', 0.05), value('fast'), value('medium', 0.05))
+
+    assert results == ['slow', 'fast', 'medium']
+    assert loop.time() - started < 0.09
+
+
+async def test_gather_cancels_siblings_and_raises_first_error():
+    sibling = asyncio.Event()
+
+    async def wait_forever():
+        try:
+            await asyncio.sleep(10)
+        finally:
+            sibling.set()
+
+    with pytest.raises(KeyError):
+        await gather(wait_forever(), fail(KeyError('genre')))
+
+    assert sibling.is_set()
+
+
+async def test_gather_maps_storage_errors():
+    error = ElasticConnectionError('connection refused')
+
+    with pytest.raises(ServiceUnavailableError) as exc_info:
+        await gather(value(1), fail(error))
+
+    assert exc_info.value.__cause__ is error
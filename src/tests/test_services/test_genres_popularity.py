@@ -0,0 +1,66 @@
+import asyncio
+from unittest.mock import AsyncMock
+from uuid import uuid4
+
+import pytest
+
+from models.models import GenrePopularity, GenreShort
+from services.genres import GenreService
+
+pytestmark = pytest.mark.asyncio
+
+GENRE = GenreShort(id=uuid4(), name='Drama')
+
+
+@pytest.fixture
+def storage() -> AsyncMock:
+    storage = AsyncMock()
+    storage.get_item.return_value = GENRE
+    storage.get_genre_popularity.return_value = 6.5
+    storage.get_genres_popularity.return_value = [
+        GenrePopularity(id=GENRE.id, popularity=7.2, films_count=10)
+    ]
+    return storage
+
+
+async def test_genre_popularity_falls_back_to_aggregation(storage):
+    genre = await GenreService(storage).get_by_id(GENRE.id)
+
+    assert genre.popularity == 6.5
+    storage.get_genre_popularity.assert_awaited_once_with(GENRE.id)
+
+
+async def test_genre_popularity_comes_from_table(storage):
+    service = GenreService(storage)
+    await service.refresh_popularity()
+
+    genre = await service.get_by_id(GENRE.id)
+    storage.get_item.return_value = GenreShort(id=uuid4(), name='Noir')
+    without_films = await service.get_by_id(uuid4())
+
+    assert genre.popularity == 7.2
+    assert without_films.popularity is None
+    storage.get_genre_popularity.assert_not_awaited()
+
+
+async def test_genre_popularity_keeps_table_on_failed_refresh(storage):
+    service = GenreService(storage)
+    await service.refresh_popularity()
+    storage.get_genres_popularity.return_value = None
+
+    await service.refresh_popularity()
+
+    assert service.popularity[GENRE.id].films_count == 10
+
+
+@pytest.mark.parametrize('error', [None, ConnectionError('elastic is down')])
+async def test_genre_popularity_signals_first_refresh(storage, error):
+    storage.get_genres_popularity.side_effect = error
+    ready = asyncio.Event()
+    service = GenreService(storage)
+
+    task = asyncio.create_task(service.refresh_popularity_periodically(60, ready))
+    await asyncio.wait_for(ready.wait(), 1)
+    task.cancel()
+
+    assert (service.popularity is None) == (error is not None)
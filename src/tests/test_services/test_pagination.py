@@ -0,0 +1,80 @@
+from uuid import uuid4
+
+import pytest
+from fastapi import HTTPException
+
+from core.pagination import (
+    PaginateQueryParams,
+    decode_cursor,
+    encode_cursor,
+    next_cursor,
+)
+from core.sorting import sort_clause
+from models.models import FilmShort
+
+
+@pytest.mark.parametrize(
+    'sort,expected',
+    [
+        (None, ['id:asc']),
+        ('+id', ['id:asc']),
+        ('-imdb_rating', ['imdb_rating:desc', 'id:asc']),
+    ],
+)
+def test_sort_clause_ends_with_id(sort, expected):
+    assert sort_clause(sort) == expected
+
+
+@pytest.mark.parametrize('imdb_rating,expected', [(7.5, 7.5), (None, '-Infinity')])
+def test_next_cursor_continues_after_last_item(imdb_rating, expected):
+    films = [
+        FilmShort(id=uuid4(), title='a', imdb_rating=8.0),
+        FilmShort(id=uuid4(), title='b', imdb_rating=imdb_rating),
+    ]
+
+    cursor = next_cursor(films, '-imdb_rating', PaginateQueryParams(1, 2))
+    pagination = PaginateQueryParams(1, 2, cursor)
+
+    assert pagination.search_after == [expected, str(films[-1].id)]
+
+
+def test_next_cursor_stops_on_last_page():
+    films = [FilmShort(id=uuid4(), title='a')]
+
+    assert next_cursor(films, None, PaginateQueryParams(1, 2)) is None
+    assert next_cursor(films, '-title', PaginateQueryParams(1, 1)) is not None
+    assert next_cursor(films, '-year', PaginateQueryParams(1, 1)) is None
+
+
+@pytest.mark.parametrize('cursor', ['not a cursor', 'e30', 'W10'])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException):
+        decode_cursor(cursor)
+
+
+@pytest.mark.parametrize(
+    'sort,search_after',
+    [
+        ('-imdb_rating', [str(uuid4())]),
+        (None, [7.5, str(uuid4())]),
+        ('-imdb_rating', ['high', str(uuid4())]),
+        ('-imdb_rating', [True, str(uuid4())]),
+        ('-year', [2000, str(uuid4())]),
+        (None, [1]),
+    ],
+)
+def test_cursor_for_other_sort_is_rejected(sort, search_after):
+    pagination = PaginateQueryParams(1, 2, encode_cursor(search_after))
+
+    with pytest.raises(HTTPException) as exc_info:
+        pagination.check_cursor(sort, FilmShort)
+
+    assert exc_info.value.status_code == 422
+
+
+@pytest.mark.parametrize('imdb_rating', [7.5, 8, '-Infinity'])
+def test_cursor_for_same_sort_is_accepted(imdb_rating):
+    cursor = encode_cursor([imdb_rating, str(uuid4())])
+
+    PaginateQueryParams(1, 2, cursor).check_cursor('-imdb_rating', FilmShort)
+    PaginateQueryParams(1, 2).check_cursor(None, FilmShort)
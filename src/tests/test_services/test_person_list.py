@@ -0,0 +1,26 @@
+from unittest.mock import AsyncMock
+from uuid import uuid4
+
+import pytest
+from fastapi import Response
+
+from api.v1.persons import person_list
+from core.pagination import PaginateQueryParams
+from models.models import FilmRoles, PersonShort
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_person_list_survives_failed_filmography():
+    persons = [PersonShort(id=uuid4(), full_name=name) for name in ('Ann', 'Bob')]
+    films = [FilmRoles(id=uuid4(), title='Film', roles=['actor'])]
+    persons_service = AsyncMock()
+    persons_service.get_by_query.return_value = persons
+    film_service = AsyncMock()
+    film_service.get_films_with_roles_by_persons.return_value = [films, None]
+
+    result = await person_list(
+        Response(), 'ann', PaginateQueryParams(1, 50), persons_service, film_service
+    )
+
+    assert [person.films for person in result] == [films, []]
@@ -0,0 +1,65 @@
+from unittest.mock import AsyncMock
+from uuid import uuid4
+
+import pytest
+
+from models.models import GenreShort
+from services.warmup import CacheWarmer, read_access_log, read_urls
+
+ACCESS_LOG = '''\
+INFO:     172.18.0.1:51234 - "GET /api/v1/genres HTTP/1.1" 200 OK
+INFO:     172.18.0.1:51236 - "GET /api/v1/films/?page_number=2 HTTP/1.1" 200 OK
+INFO:     172.18.0.1:51238 - "GET /api/v1/films/?page_number=2 HTTP/1.1" 200 OK
+INFO:     172.18.0.1:51240 - "GET /api/v1/films/missing HTTP/1.1" 404 Not Found
+INFO:     172.18.0.1:51242 - "POST /api/v1/cache/cleanup HTTP/1.1" 200 OK
+'''
+
+
+def test_read_access_log():
+    lines = ACCESS_LOG.splitlines()
+
+    assert read_access_log(lines) == ['/api/v1/films/?page_number=2', '/api/v1/genres']
+    assert read_access_log(lines, limit=1) == ['/api/v1/films/?page_number=2']
+
+
+def test_read_urls():
+    lines = ['/api/v1/genres\n', '\n', '# популярное\n', '/api/v1/films/  # главная\n']
+
+    assert read_urls(lines) == ['/api/v1/genres', '/api/v1/films/']
+
+
+@pytest.mark.asyncio
+async def test_cache_warmer_runs_services():
+    genres = [
+        GenreShort(id=uuid4(), name='Action'),
+        GenreShort(id=uuid4(), name='Drama'),
+    ]
+    genre_service = AsyncMock()
+    genre_service.get_genres.return_value = genres
+    film_service = AsyncMock()
+
+    warmer = CacheWarmer(
+        genre_service,
+        film_service,
+        pages=2,
+        page_size=10,
+        sorts=['id:asc', '-imdb_rating'],
+    )
+    await warmer.run_periodically(0)
+
+    assert [call.args for call in genre_service.get_by_id.await_args_list] == [
+        (genres[0].id,),
+        (genres[1].id,),
+    ]
+    calls = [
+        (sort, pagination.page_number, pagination.page_size)
+        for sort, pagination, *_ in (
+            call.args for call in film_service.get_films.await_args_list
+        )
+    ]
+    assert calls == [
+        ('id:asc', 1, 10),
+        ('id:asc', 2, 10),
+        ('-imdb_rating', 1, 10),
+        ('-imdb_rating', 2, 10),
+    ]
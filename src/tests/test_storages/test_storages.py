@@ -0,0 +1,60 @@
+from unittest.mock import AsyncMock, MagicMock
+from uuid import uuid4
+
+import pytest
+
+from cache import FAILED
+from storages.storages import FilmElasticStorage
+
+pytestmark = pytest.mark.asyncio
+
+FILM_ID = uuid4()
+
+
+def roles_hit(**totals: int) -> dict:
+    return {
+        '_source': {'id': str(FILM_ID), 'title': 'Star Wars', 'imdb_rating': 8.6},
+        'inner_hits': {
+            f'{name}_inner_hits': {'hits': {'total': {'value': total}}}
+            for name, total in totals.items()
+        },
+    }
+
+
+@pytest.fixture
+def manager() -> MagicMock:
+    manager = MagicMock()
+    manager.msearch = AsyncMock(
+        return_value={
+            'responses': [
+                {'status': 200, 'hits': {'hits': [roles_hit(actors=1, writers=1)]}},
+                {'status': 200},
+                {'status': 400, 'error': {'type': 'search_phase_execution_exception'}},
+            ]
+        }
+    )
+    return manager
+
+
+async def test_films_with_roles_by_persons_sends_one_msearch(manager):
+    storage = FilmElasticStorage(lambda: manager)
+    person_ids = [uuid4(), uuid4(), uuid4()]
+
+    # Без кэша: проверяем сам запрос и разбор ответа
+    films = await FilmElasticStorage.get_films_with_roles_by_persons.__wrapped__(
+        storage, '-imdb_rating', None, person_ids
+    )
+
+    manager.msearch.assert_awaited_once()
+    searches = manager.msearch.await_args.kwargs['searches']
+    assert searches[::2] == [{'index': 'movies'}] * 3
+    assert searches[1]['sort'] == [
+        {'imdb_rating': {'order': 'desc'}},
+        {'id': {'order': 'asc'}},
+    ]
+    assert 'responses.status' in manager.msearch.await_args.kwargs['filter_path']
+
+    assert [film.id for film in films[0]] == [FILM_ID]
+    assert sorted(films[0][0].roles) == ['actor', 'writer']
+    assert films[1] == []
+    assert films[2] is FAILED